@@ -7,6 +7,9 @@ class Settings(BaseSettings):
     secret_key: str = Field(default="changeme")
     storage_dir: Path = Field(default=Path("/data/storage"))
     expiry_hours: int = Field(default=24)
+    cleanup_batch_size: int = Field(default=1000)      # expired job ids pulled from the index per round
+    cleanup_concurrency: int = Field(default=8)        # parallel rmtree workers (local) / job listings (S3)
+    sweep_grace_hours: int = Field(default=24)         # the full sweep only takes what indexed cleanup should have
 
     # Storage backend: "local" | "s3"
     storage_backend: str = Field(default="local")
@@ -18,8 +21,92 @@ class Settings(BaseSettings):
     s3_access_key: str | None = None
     s3_secret_key: str | None = None
     s3_force_path_style: bool = True       # True for MinIO; False for AWS S3 virtual-hosted style
+    s3_max_pool_connections: int = Field(default=32)
+    s3_transfer_concurrency: int = Field(default=8)   # parallel part GETs/PUTs per transfer
+
+    # Worker-local scratch for S3: staged inputs (LRU-evicted) and per-job work dirs
+    staging_dir: Path = Field(default=Path("/tmp/convertbuddy-staging"))
+    staging_max_bytes: int = Field(default=10 * 1024 ** 3)
+
+    # Uploads are streamed to the backend in chunks; anything larger is rejected with 413
+    max_upload_bytes: int = Field(default=4 * 1024 ** 3)
+    upload_chunk_bytes: int = Field(default=1024 * 1024)
+    max_form_field_bytes: int = Field(default=1024 * 1024)  # non-file multipart fields (target, options, keys)
+    s3_part_bytes: int = Field(default=16 * 1024 * 1024)   # multipart part size (min 5 MiB)
+    upload_part_bytes: int = Field(default=16 * 1024 * 1024)  # upload-session part size (grown to stay under 10,000 parts)
+
+    # Engine subprocess limits; a hung conversion is killed with its whole process group
+    engine_timeout: int = Field(default=3600)           # wall-clock seconds per job
+    engine_cpu_seconds: int = Field(default=0)          # RLIMIT_CPU per engine process, 0 = unlimited
+    progress_interval: float = Field(default=1.0)       # min seconds between progress updates
+    cancel_grace_seconds: float = Field(default=10.0)   # a cancelled job still running after this is SIGTERMed
+
+    max_batch_files: int = Field(default=500)
+
+    # Job status reads: Redis job records behind a short per-process cache
+    job_status_cache_seconds: float = Field(default=1.0)  # 0 disables the cache
+    max_status_ids: int = Field(default=500)             # ids per bulk status request
+    job_outputs_inline: int = Field(default=20)          # ready outputs listed in GET /jobs/{id}
+    max_outputs_page: int = Field(default=1000)          # limit cap for GET /jobs/{id}/outputs
+
+    # pdf->jpg: pages are rasterized in chunks by parallel pdftoppm processes
+    pdf_raster_concurrency: int = Field(default=0)       # 0 = os.cpu_count()
+    pdf_raster_chunk_pages: int = Field(default=8)
+
+    # images->pdf: "native" embeds JPEGs as-is and decodes other images one at a
+    # time in-process (ImageMagick is the fallback); "magick" always shells out
+    image_pdf_engine: str = Field(default="native")
+    image_pdf_threads: int = Field(default=4)
+
+    # docx->pdf: warm headless LibreOffice instances per worker process (0 disables)
+    office_pool_size: int = Field(default=1)
+    office_max_conversions: int = Field(default=200)    # recycle an instance after N documents
+    office_timeout: int = Field(default=120)            # seconds per conversion
+    office_start_timeout: int = Field(default=30)
+    office_python: str = Field(default="/usr/bin/python3")  # interpreter that can `import uno`
+    office_profile_root: Path = Field(default=Path("/tmp/convertbuddy-office"))
+
+    # mp4->mp3: inputs are ffprobed once (cached by content hash); long inputs can be
+    # decoded as parallel time segments (to PCM scratch, ~10 MB/min) and encoded once
+    probe_timeout: int = Field(default=30)
+    ffmpeg_split_min_seconds: int = Field(default=1800)  # split inputs at least this long (0 disables)
+    ffmpeg_segment_seconds: int = Field(default=600)
+    ffmpeg_segment_workers: int = Field(default=0)       # 0 = os.cpu_count()
+
+    # /files downloads: "none" streams through the API; "x-accel" (nginx) or
+    # "x-sendfile" (Apache/lighttpd) hand the bytes to the front proxy
+    download_offload: str = Field(default="none")
+    download_offload_prefix: str = Field(default="/_protected/")  # internal location mapped to storage_dir
+    download_max_age: int = Field(default=3600)
+
+    # Queue routing: per-engine queues, each with a fast and a slow lane
+    slow_lane_bytes: int = Field(default=50 * 1024 * 1024)
+    slow_lane_pages: int = Field(default=50)
+    slow_lane_seconds: int = Field(default=900)         # media duration, known from the probe
+    ffmpeg_concurrency: int = Field(default=2)         # ffmpeg is multi-threaded itself
+    raster_concurrency: int = Field(default=0)         # 0 = Celery default (CPU count)
+    office_concurrency: int = Field(default=2)
 
     redis_url: str = Field(default="redis://redis:6379/0")
+
+    # Content-addressed result cache (input hash + target + options)
+    result_cache_enabled: bool = Field(default=True)
+    result_cache_max_bytes: int = Field(default=5 * 1024 ** 3)
+    result_cache_ttl_hours: int = Field(default=72)
+
+    # Admission control for POST /jobs and /jobs/batch (0 disables a check)
+    max_request_bytes: int = Field(default=8 * 1024 ** 3)          # whole request body, enforced while streaming
+    quota_rate: float = Field(default=1.0)                          # submissions/s refilled per client
+    quota_burst: int = Field(default=30)
+    admission_max_queued_total: int = Field(default=2000)          # waiting jobs across all conversion queues
+    admission_max_queued: int = Field(default=500)                 # waiting jobs per engine
+    admission_max_queued_bytes: int = Field(default=50 * 1024 ** 3)  # queued input bytes per engine
+    admission_retry_after: int = Field(default=30)                 # seconds, sent with overload 429s
+    trust_forwarded_for: bool = Field(default=False)               # key quotas on X-Forwarded-For (behind a proxy)
+
+    # Prometheus exporter port of each Celery worker (0 disables); the API serves /metrics
+    worker_metrics_port: int = Field(default=9808)
+
     api_host: str = Field(default="0.0.0.0")
     api_port: int = Field(default=8000)
 
@@ -30,4 +117,3 @@ class Settings(BaseSettings):
     }
 
 settings = Settings()
-settings.storage_dir.mkdir(parents=True, exist_ok=True)
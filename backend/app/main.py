@@ -1,10 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import health, jobs, files
+from .routers import health, jobs, files, metrics, uploads
 from .config import settings
+from .middleware import AdmissionMiddleware
 
 app = FastAPI(title="Convert Buddy API", version="0.1.1")
 
+# Added first so CORS wraps it and 429/413 rejections stay readable cross-origin
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,5 +18,7 @@ app.add_middleware(
 
 app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
 # Custom file router that forces download (no StaticFiles mount)
 app.include_router(files.router, tags=["files"])
+app.include_router(metrics.router, tags=["metrics"])
@@ -0,0 +1,64 @@
+from urllib.parse import parse_qs
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from .config import settings
+from .services import admission, registry
+
+_SUBMIT_PATHS = ("/jobs", "/jobs/batch", "/uploads")
+
+def _client_id(scope, headers: dict[bytes, bytes]) -> str:
+    key = headers.get(b"x-api-key")
+    if key:
+        return f"key:{key.decode(errors='replace')}"
+    if settings.trust_forwarded_for and (fwd := headers.get(b"x-forwarded-for")):
+        return f"ip:{fwd.decode(errors='replace').split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+def _admit(client: str, target: str):
+    return admission.admit_request(client) or (target and admission.check_capacity(registry.engine_for(target)))
+
+class AdmissionMiddleware:
+    """Rejects job submissions before their body is read.
+
+    Declared Content-Length over the cap -> 413; client over quota, the
+    queues overloaded or, for a ``?target=`` given in the query, that engine's
+    backlog full -> 429 with Retry-After. Bodies without a length are counted
+    as they stream in and cut off at the cap.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in _SUBMIT_PATHS:
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        limit = settings.max_request_bytes
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await JSONResponse({"detail": f"Request exceeds {limit} bytes"}, status_code=413)(scope, receive, send)
+        target = parse_qs(scope.get("query_string", b"").decode(errors="replace")).get("target", [""])[0]
+        rejection = await run_in_threadpool(_admit, _client_id(scope, headers), target)
+        if rejection:
+            response = JSONResponse(
+                {"detail": rejection.detail}, status_code=429, headers={"Retry-After": str(rejection.retry_after)},
+            )
+            return await response(scope, receive, send)
+        if target:
+            # The handler skips its own per-engine check for this target (request.state)
+            scope.setdefault("state", {})["admitted_target"] = target
+
+        received = 0
+
+        async def capped_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=f"Request exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, capped_receive, send)
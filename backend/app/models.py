@@ -1,13 +1,74 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal, Dict
+from typing import Optional, Literal, Dict, List
 
 class JobCreate(BaseModel):
     target: str = Field(..., description="e.g., 'pdf->jpg', 'mp4->mp3'")
     options: Optional[Dict] = None
 
+class OutputInfo(BaseModel):
+    index: int = Field(..., description="1-based position (page order)")
+    name: str
+    size: int
+    download_url: str
+
 class JobInfo(BaseModel):
     job_id: str
-    status: Literal["queued","processing","done","error"]
+    status: Literal["queued","processing","done","error","cancelled"]
+    progress: int = 0
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+    target: Optional[str] = None
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    input_size: Optional[int] = None
+    output_bytes: Optional[int] = None
+    # Multi-output jobs (e.g. pdf->jpg): files published so far, downloadable before the job is done
+    outputs_ready: int = 0
+    outputs_total: Optional[int] = None
+    outputs: List[OutputInfo] = Field([], description="The first ready outputs; GET /jobs/{job_id}/outputs pages through all")
+
+class OutputList(BaseModel):
+    job_id: str
+    status: Literal["queued","processing","done","error","cancelled"]
+    outputs_ready: int = 0
+    outputs_total: Optional[int] = None
+    offset: int = 0
+    outputs: List[OutputInfo] = []
+
+class JobStatusRequest(BaseModel):
+    ids: List[str]
+
+class JobStatusList(BaseModel):
+    jobs: List[JobInfo] = []
+    missing: List[str] = Field([], description="Unknown or expired job ids")
+
+class BatchInfo(BaseModel):
+    batch_id: str
+    status: Literal["queued","processing","done","error","cancelled"]
     progress: int = 0
+    total: int = 0
+    done: int = 0
+    failed: int = 0
     download_url: Optional[str] = None
     error: Optional[str] = None
+    jobs: List[JobInfo] = []
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0, description="Total bytes; fixes the part layout")
+    content_type: Optional[str] = None
+
+class UploadInfo(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    part_size: int
+    parts: int
+    status: Literal["open","complete"]
+    direct: bool = Field(False, description="Parts go straight to object storage via presigned URLs")
+    parts_received: List[int] = []
+    key: Optional[str] = None
+
+class PartUrlsRequest(BaseModel):
+    parts: List[int]
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+import json, os, stat
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pathlib import Path
 from ..config import settings
+from ..services.manifest import ROLES
+from ..services.storage_backend import CACHE_PREFIX, MANIFEST_NAME
 
 router = APIRouter()
 
 BASE = Path(settings.storage_dir).resolve()
+CHUNK = 256 * 1024
 
 def _safe_path(relpath: str) -> Path:
     # Prevent path traversal by resolving and ensuring it's under BASE
@@ -14,15 +21,140 @@ def _safe_path(relpath: str) -> Path:
         raise HTTPException(status_code=400, detail="Invalid path")
     return candidate
 
-@router.get("/files/{relpath:path}")
-async def download(relpath: str):
-    file_path = _safe_path(relpath)
-    if not file_path.exists() or not file_path.is_file():
+def _listed(file_path: Path) -> dict | None:
+    """The file's entry in its job manifest.
+
+    None for files outside any job (result cache) and for jobs stored before
+    manifests existed; files a manifest does not list (partial writes, upload
+    parts, the manifest itself) are not served.
+    """
+    rel = file_path.relative_to(BASE).parts
+    if not rel or rel[0] == CACHE_PREFIX:
+        return None
+    depth = 3 if len(rel[0]) == 2 else 1   # ab/cd/<job_id> or legacy <job_id>
+    if len(rel) <= depth:
+        return None
+    try:
+        m = json.loads((BASE.joinpath(*rel[:depth]) / MANIFEST_NAME).read_bytes())
+    except (OSError, ValueError):
+        return None
+    tail = "/" + "/".join(rel[depth:])
+    for role in ROLES:
+        for e in m.get(role, []):
+            if e["key"].replace(os.sep, "/").endswith(tail):
+                return e
+    raise HTTPException(status_code=404, detail="File not found")
+
+def _resolve(file_path: Path) -> tuple[os.stat_result, dict | None]:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(st.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
-    # Force download via Content-Disposition: attachment
+    return st, _listed(file_path)
+
+def _etag(st: os.stat_result, entry: dict | None = None) -> str:
+    # Content hash when the manifest has one: stable across copies and hard links
+    if entry and entry.get("sha256"):
+        return f'"{entry["sha256"][:32]}"'
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def _not_modified(request: Request, etag: str, st: os.stat_result) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Single byte range -> (start, end inclusive). Raises 416 if unsatisfiable.
+
+    Multi-range requests return None and get the full body, which RFC 9110 allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+async def _iter_range(path: Path, start: int, length: int):
+    import aiofiles
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+@router.api_route("/files/{relpath:path}", methods=["GET", "HEAD"])
+async def download(relpath: str, request: Request):
+    file_path = _safe_path(relpath)
+    st, entry = await run_in_threadpool(_resolve, file_path)
+
+    etag = _etag(st, entry)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": f"private, max-age={settings.download_max_age}",
+        # Force download via Content-Disposition: attachment
+        "Content-Disposition": f"attachment; filename={file_path.name}",
+    }
+    if _not_modified(request, etag, st):
+        return Response(status_code=304, headers=headers)
+
+    # _safe_path above is the authorization check; the proxy only moves bytes
+    mode = settings.download_offload.lower()
+    if mode == "x-accel":
+        rel = quote(file_path.relative_to(BASE).as_posix())
+        headers["X-Accel-Redirect"] = settings.download_offload_prefix.rstrip("/") + "/" + rel
+        return Response(headers=headers, media_type="application/octet-stream")
+    if mode == "x-sendfile":
+        headers["X-Sendfile"] = str(file_path)
+        return Response(headers=headers, media_type="application/octet-stream")
+
+    rng = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if rng and (not if_range or if_range.strip() in (etag, headers["Last-Modified"])):
+        parsed = _parse_range(rng, st.st_size)
+        if parsed:
+            start, end = parsed
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_range(file_path, start, length),
+                status_code=206,
+                headers=headers,
+                media_type="application/octet-stream",
+            )
+
     return FileResponse(
         path=file_path,
         filename=file_path.name,  # triggers attachment behavior
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f"attachment; filename={file_path.name}"}
+        headers=headers,
+        stat_result=st,
     )
@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from ..services import result_cache
 router = APIRouter()
 
 @router.get("/live")
@@ -8,3 +9,7 @@ def live():
 @router.get("/ready")
 def ready():
     return {"ok": True}
+
+@router.get("/cache")
+def cache_stats():
+    return result_cache.stats()
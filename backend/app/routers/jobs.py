@@ -1,92 +1,361 @@
-import uuid, magic, json
+import asyncio, uuid, json, hashlib, time
+from pathlib import Path
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from ..models import JobInfo
-from ..services.storage import save_upload, save_uploads
-from ..workers.tasks import convert_task, celery
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from celery import chord
+from celery.backends.redis import RedisBackend
+from ..models import JobInfo, BatchInfo, JobStatusRequest, JobStatusList, OutputInfo, OutputList
+from ..config import settings
+from ..services.storage import presign_download, delete, is_stored_key
+from ..services.batches import save_batch, load_batch
+from ..services.ingest import ingest_upload, FormStream, FormPart, Ingested, UploadTooLarge, BadForm, is_urlencoded, read_urlencoded
+from ..services import result_cache, expiry, registry, metrics, admission, uploads, media, manifest, jobstore
+from ..services.cancel import request_cancel
+from ..services.redis_client import get_redis
+from ..services.events import get_hub, TERMINAL
+# Tasks are sent by name, so the API never imports the task module; it does import
+# registry (and with it conversions and pdfwriter) for planning and validation
+from ..workers.celery_app import celery, CONVERT_TASK, PACKAGE_TASK
 
 router = APIRouter()
 
-SUPPORTED = {"mp4->mp3","pdf->jpg","jpg->pdf","docx->pdf"}
-
-def _mime_from(file: UploadFile) -> str:
-    head = file.file.read(8192)
-    file.file.seek(0)
-    return magic.from_buffer(head, mime=True)
-
-def _validate_single(file: UploadFile, target: str):
-    mime = _mime_from(file)
-    if target == "mp4->mp3" and not (mime.startswith("video/") or file.filename.lower().endswith(".mp4")):
-        raise HTTPException(status_code=400, detail=f"Input does not look like a video file (got {mime}).")
-    if target in {"jpg->pdf"} and not (mime.startswith("image/") or file.filename.lower().endswith((".jpg",".jpeg",".png",".webp",".tif",".tiff"))):
-        raise HTTPException(status_code=400, detail=f"Input does not look like an image (got {mime}).")
-    if target in {"pdf->jpg"} and not (mime == "application/pdf" or file.filename.lower().endswith(".pdf")):
-        raise HTTPException(status_code=400, detail=f"Input does not look like a PDF (got {mime}).")
-    if target == "docx->pdf" and not file.filename.lower().endswith(".docx"):
-        raise HTTPException(status_code=400, detail="Please upload a .docx file for docx->pdf.")
-
-def _validate_multi(files: List[UploadFile]):
-    if len(files) < 2:
+SUPPORTED = registry.supported_targets()
+
+def _cached_job(job_id: str, key: str, target: str) -> Optional[JobInfo]:
+    with metrics.timed("cache_lookup", target):
+        cached = result_cache.lookup(key)
+    if cached is None:
+        return None
+    now = time.time()
+    # Record the result so GET /jobs/{job_id} answers like for a converted job
+    jobstore.update(job_id, status="done", progress=100, target=target, created=now, finished=now, output=str(cached), cached=1)
+    return JobInfo(job_id=job_id, status="done", progress=100, download_url=presign_download(cached), target=target)
+
+def _validate_single(filename: str, mime: str, target: str):
+    fmt = registry.source_format(target)
+    if not fmt.accepts(filename, mime):
+        if not fmt.mime_prefixes:
+            raise HTTPException(status_code=400, detail=f"Please upload {fmt.label} for {target}.")
+        raise HTTPException(status_code=400, detail=f"Input does not look like {fmt.label} (got {mime}).")
+
+async def _ingest(job_id: str, upload: FormPart, stored_name: str, check, target: str) -> Ingested:
+    try:
+        with metrics.timed("ingest", target):
+            return await ingest_upload(job_id, upload, stored_name, check=check, target=target)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+async def _discard(saved: List[Ingested]):
+    for item in saved:
+        await run_in_threadpool(delete, item.path)
+
+async def _admit(target: str, request: Request):
+    # Per-engine backlog; quota and global overload were checked by AdmissionMiddleware,
+    # and so was this backlog if the target came in the query string
+    if getattr(request.state, "admitted_target", None) == target:
         return
-    for f in files:
-        mime = _mime_from(f)
-        if not (mime.startswith("image/") or f.filename.lower().endswith((".jpg",".jpeg",".png",".webp",".tif",".tiff"))):
-            raise HTTPException(status_code=400, detail=f"All files must be images (got {mime}).")
-
-
-@router.post("/", response_model=JobInfo)
-async def create_job(
-    target: str = Form(...),
-    file: Optional[UploadFile] = File(None),
-    files: Optional[List[UploadFile]] = File(None, description="Multiple images for jpg->pdf"),
-    options: str = Form("{}", description='JSON string with options (e.g., {"dpi":300,"bitrate":"192k"})'),
-):
+    rejection = await run_in_threadpool(admission.check_capacity, registry.engine_for(target))
+    if rejection:
+        raise HTTPException(status_code=429, detail=rejection.detail, headers={"Retry-After": str(rejection.retry_after)})
+
+async def _probe(target: str, digest: str) -> dict:
+    """Cached ffprobe facts for media inputs seen before: reject silent files, route by duration.
+
+    Never runs ffprobe here; the worker probes new inputs and fills the cache.
+    """
+    if registry.source_format(target).name != "mp4":
+        return {}
+    with metrics.timed("probe", target):
+        info = await run_in_threadpool(media.cached, digest)
+    if info is None:
+        return {"input_sha256": digest}
+    if not info["audio"]:
+        raise HTTPException(status_code=400, detail="The video has no audio track.")
+    return {"media": info, "duration": info["duration"] or None}
+
+def _record_inputs(job_id: str, stored: List[Ingested]):
+    if stored:
+        manifest.record(job_id, "inputs", [manifest.entry(str(i.path), i.size, i.sha256, mime=i.mime) for i in stored])
+
+async def _enqueue(job_id: str, stored: Optional[List[Ingested]] = None, **kwargs) -> JobInfo:
+    def send():
+        _record_inputs(job_id, stored)
+        jobstore.create(job_id, kwargs["target"], kwargs.get("input_size"))  # before the worker can update it
+        expiry.track(job_id)
+        admission.enqueued(registry.engine_for(kwargs["target"]), {job_id: kwargs.get("input_size")})
+        return celery.send_task(CONVERT_TASK, kwargs=dict(job_id=job_id, enqueued_at=time.time(), **kwargs), task_id=job_id)
+    task = await run_in_threadpool(send)
+    return JobInfo(job_id=task.id, status="queued", progress=0, target=kwargs["target"])
+
+
+def _form_body(**fields) -> dict:
+    """OpenAPI body for handlers that stream their multipart form themselves."""
+    schema = {"type": "object", "properties": {
+        name: {"type": "string", "format": "binary", "description": doc} if name == "file" else
+        {"type": "array", "items": {"type": "string", "format": "binary"}, "description": doc} if name == "files" else
+        {"type": "string", "description": doc}
+        for name, doc in fields.items()
+    }}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
+_TARGET_DOC = ("Target format; sent here the engine's backlog is checked before the body is read. "
+               "May instead be the `target` form field, ideally before the files")
+
+def _check_target(target: Optional[str]) -> str:
+    if not target:
+        raise HTTPException(status_code=400, detail="Please choose a target.")
     if target not in SUPPORTED:
         raise HTTPException(status_code=400, detail=f"Unsupported target '{target}'. Supported: {sorted(SUPPORTED)}")
+    return target
 
-    # Parse options
+def _options(raw: Optional[str]) -> dict:
     try:
-        opts = json.loads(options) if options else {}
+        return json.loads(raw) if raw else {}
     except Exception:
-        opts = {}
+        return {}
+
+async def _read_form(request: Request, target: Optional[str], stored_as, max_files: Optional[int] = None):
+    """Stream the form body: fields are kept, file parts are ingested as they arrive.
 
+    ``stored_as(field, filename, idx)`` gives the (job_id, stored name) of a
+    file. Files are type-checked while streaming once the target is known (query
+    parameter or a field sent before them), otherwise after the body is read.
+    Returns (target, fields, [(job_id, Ingested)]).
+    """
+    fields: dict[str, str] = {}
+    saved: List[tuple[str, Ingested]] = []
+    checked = None  # target the stored files were checked against
+    try:
+        if is_urlencoded(request):
+            # Fields-only submissions (upload_id, keys) may come urlencoded
+            fields.update(await read_urlencoded(request, settings.max_form_field_bytes))
+        else:
+            async for part in FormStream(request):
+                if part.filename is None:
+                    fields[part.name] = await part.text(settings.max_form_field_bytes)
+                    continue
+                if part.name not in ("file", "files"):
+                    continue
+                if max_files is not None and len(saved) >= max_files:
+                    raise HTTPException(status_code=400, detail=f"A batch holds at most {max_files} files.")
+                if checked is None and (target or fields.get("target")):
+                    checked = _check_target(target or fields["target"])
+                    await _admit(checked, request)
+                name = part.filename or "upload"
+                job_id, stored_name = stored_as(part.name, name, len(saved) + 1)
+                check = (lambda mime, n=name, t=checked: _validate_single(n, mime, t)) if checked else None
+                saved.append((job_id, await _ingest(job_id, part, stored_name, check, checked or "")))
+        target = _check_target(target or fields.get("target"))
+        if checked is None:
+            await _admit(target, request)
+            for _, item in saved:
+                _validate_single(item.filename, item.mime, target)
+    except BadForm as e:
+        await _discard([i for _, i in saved])
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        await _discard([i for _, i in saved])
+        raise
+    return target, fields, saved
+
+
+@router.post("/", response_model=JobInfo, openapi_extra=_form_body(
+    target="Target format (or the `target` query parameter)",
+    file="Input file",
+    files="Multiple inputs merged into one output (e.g. images for jpg->pdf)",
+    options='JSON string with options (e.g., {"dpi":300,"bitrate":"192k"})',
+    upload_id="Completed upload session (POST /uploads) to convert instead of a file",
+))
+async def create_job(request: Request, target: Optional[str] = Query(None, description=_TARGET_DOC)):
     job_id = str(uuid.uuid4())
+    target, fields, saved = await _read_form(
+        request, target, lambda field, name, idx: (job_id, f"input_{name}" if field == "file" else f"{idx:03d}_{name}"),
+    )
+    stored = [i for _, i in saved]
+    opts = _options(fields.get("options"))
 
-    if target == "jpg->pdf" and files and len(files) >= 2:
-        # Multi-image path
-        _validate_multi(files)
-        saved_paths = save_uploads(job_id, files)
-        task = convert_task.delay(job_id=job_id, target=target, input_path=None, options=opts, multi_inputs=[str(p) for p in saved_paths])
-        return JobInfo(job_id=task.id, status="queued", progress=0)
+    if upload_id := fields.get("upload_id"):
+        # Input already stored by an upload session; it stays reusable, so a cache hit keeps it
+        await _discard(stored)
+        session = await run_in_threadpool(uploads.load, upload_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        if session.status != "complete":
+            raise HTTPException(status_code=409, detail="Upload is not complete")
+        _validate_single(session.filename, session.mime, target)
+        key = result_cache.cache_key(session.sha256, target, opts)
+        hit = await run_in_threadpool(_cached_job, job_id, key, target)
+        if hit:
+            return hit
+        return await _enqueue(
+            job_id, target=target, input_path=session.key, options=opts, cache_key=key,
+            input_size=session.size, page_count=session.pages if session.pages >= 0 else None,
+            **await _probe(target, session.sha256),
+        )
+
+    if len(stored) >= 2:
+        # Multi-input path (e.g. images -> one PDF): each file was sniffed, hashed and stored in one streaming pass
+        if not registry.accepts_many(target):
+            await _discard(stored)
+            raise HTTPException(status_code=400, detail=f"{target} takes one file; use /jobs/batch to convert several.")
+        digest = hashlib.sha256("".join(i.sha256 for i in stored).encode()).hexdigest()
+        key = result_cache.cache_key(digest, target, opts)
+        hit = await run_in_threadpool(_cached_job, job_id, key, target)
+        if hit:
+            await _discard(stored)
+            return hit
+        return await _enqueue(
+            job_id, stored, target=target, input_path=None, options=opts, multi_inputs=[str(i.path) for i in stored], cache_key=key,
+            input_size=sum(i.size for i in stored), page_count=len(stored),
+        )
 
     # Single-file path (default)
-    if not file:
+    if not stored:
         raise HTTPException(status_code=400, detail="Please upload a file.")
-    _validate_single(file, target)
-    input_path = save_upload(job_id, file)
-    task = convert_task.delay(job_id=job_id, target=target, input_path=str(input_path), options=opts)
-    return JobInfo(job_id=task.id, status="queued", progress=0)
+    item = stored[0]
+    key = result_cache.cache_key(item.sha256, target, opts)
+    hit = await run_in_threadpool(_cached_job, job_id, key, target)
+    if hit:
+        await _discard([item])
+        return hit
+    try:
+        probed = await _probe(target, item.sha256)
+    except HTTPException:
+        await _discard([item])
+        raise
+    return await _enqueue(
+        job_id, [item], target=target, input_path=str(item.path), options=opts, cache_key=key,
+        input_size=item.size, page_count=item.pages, **probed,
+    )
 
 
-@router.get("/{job_id}", response_model=JobInfo)
-def get_status(job_id: str):
-    async_result = celery.AsyncResult(job_id)
-    status_map = {
-        "PENDING":"queued",
-        "RECEIVED":"processing","STARTED":"processing","RETRY":"processing",
-        "SUCCESS":"done","FAILURE":"error"
-    }
+@router.post("/batch", response_model=BatchInfo, openapi_extra=_form_body(
+    target="Target format (or the `target` query parameter)",
+    files="Files to convert, one job each",
+    keys="JSON list of already-uploaded storage keys",
+    options="JSON options applied to every file",
+))
+async def create_batch(request: Request, target: Optional[str] = Query(None, description=_TARGET_DOC)):
+    target, fields, saved = await _read_form(
+        request, target, lambda field, name, idx: (str(uuid.uuid4()), f"input_{name}"), max_files=settings.max_batch_files,
+    )
+    ingested = dict(saved)
     try:
-        st = status_map.get(async_result.status, "queued")
-    except Exception:
-        st = "error"
-    info = async_result.info if isinstance(async_result.info, dict) else {}
-    if st == "error" and not info:
+        opts = _options(fields.get("options"))
         try:
-            exc = async_result.result
-            info = {"error": str(exc)}
-        except Exception:
-            info = {"error": "Task failed"}
+            stored_keys = json.loads(fields.get("keys") or "[]")
+            if not isinstance(stored_keys, list):
+                raise ValueError
+        except ValueError:
+            raise HTTPException(status_code=400, detail="keys must be a JSON list of storage keys")
+        if not saved and not stored_keys:
+            raise HTTPException(status_code=400, detail="Please upload files or pass keys.")
+        if len(saved) + len(stored_keys) > settings.max_batch_files:
+            raise HTTPException(status_code=400, detail=f"A batch holds at most {settings.max_batch_files} files.")
+        items: List[tuple[str, str, str, Optional[int], Optional[int]]] = []  # (job_id, input key, display name, size, pages)
+        for key in stored_keys:
+            key = str(key)
+            name = Path(key).name
+            _validate_single(name, "", target)
+            if not await run_in_threadpool(is_stored_key, key):
+                raise HTTPException(status_code=400, detail=f"Unknown upload key: {key}")
+            items.append((str(uuid.uuid4()), key, name, None, None))
+    except BaseException:
+        await _discard(list(ingested.values()))
+        raise
+    items += [(job_id, str(i.path), i.filename, i.size, i.pages) for job_id, i in saved]
+    batch_id = str(uuid.uuid4())
+
+    job_ids = [i[0] for i in items]
+    names = [i[2] for i in items]
+    def dispatch():
+        enqueued_at = time.time()
+        header = [
+            celery.signature(CONVERT_TASK, kwargs=dict(
+                job_id=job_id, target=target, input_path=key, options=opts, batch_id=batch_id,
+                input_size=size, page_count=pages, enqueued_at=enqueued_at,
+            )).set(task_id=job_id)
+            for job_id, key, _, size, pages in items
+        ]
+        for job_id, item in ingested.items():
+            _record_inputs(job_id, [item])
+        pipe = get_redis().pipeline(transaction=False)
+        for job_id, _, _, size, _ in items:
+            jobstore.create(job_id, target, size, batch_id, pipe=pipe)
+        pipe.execute()
+        save_batch(batch_id, target, job_ids, names)
+        expiry.track(batch_id, *job_ids)
+        admission.enqueued(registry.engine_for(target), {i[0]: i[3] for i in items})
+        # group members spread across every worker; the callback runs once all are done
+        chord(header)(celery.signature(PACKAGE_TASK, kwargs=dict(batch_id=batch_id, names=names)).set(task_id=batch_id))
+
+    await run_in_threadpool(dispatch)
+    return BatchInfo(
+        batch_id=batch_id, status="queued", total=len(items),
+        jobs=[JobInfo(job_id=j, status="queued", target=target) for j in job_ids],
+    )
+
+
+@router.get("/batch/{batch_id}", response_model=BatchInfo)
+def get_batch(batch_id: str):
+    record = load_batch(batch_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    jobs = _lookup_many(record["jobs"])
+    jobs = [jobs.get(j) or JobInfo(job_id=j, status="error", error="Job record expired") for j in record["jobs"]]
+    total = len(jobs)
+    terminal = ("done", "error", "cancelled")
+    finished = sum(1 for j in jobs if j.status in terminal)
+    failed = sum(1 for j in jobs if j.status in ("error", "cancelled"))
+    info = BatchInfo(
+        batch_id=batch_id, status="processing", total=total,
+        done=finished - failed, failed=failed, jobs=jobs,
+        # member conversions are 95% of the work, the archive the last 5%
+        progress=int(sum(100 if j.status in terminal else j.progress for j in jobs) / max(total, 1) * 0.95),
+    )
+    final = celery.AsyncResult(batch_id)
+    if final.status == "SUCCESS" and isinstance(final.info, dict):
+        info.status, info.progress, info.download_url = "done", 100, final.info.get("download_url")
+    elif final.status == "FAILURE":
+        info.status, info.error = "error", str(final.result)
+    elif not finished and all(j.status == "queued" for j in jobs):
+        info.status = "queued"
+    return info
+
+
+_STATUS_MAP = {
+    "PENDING": "queued",
+    "RECEIVED": "processing", "STARTED": "processing", "RETRY": "processing",
+    "SUCCESS": "done", "FAILURE": "error", "REVOKED": "cancelled",
+}
+
+def _info(job_id: str, rec: dict) -> JobInfo:
+    return JobInfo(
+        job_id=job_id, status=rec.get("status", "queued"), progress=rec.get("progress", 0),
+        download_url=presign_download(rec["output"]) if rec.get("output") else None,
+        error=rec.get("error"), target=rec.get("target"),
+        created_at=rec.get("created"), started_at=rec.get("started"), finished_at=rec.get("finished"),
+        input_size=rec.get("input_size"), output_bytes=rec.get("output_bytes"),
+        outputs_ready=rec.get("outputs_ready", 0), outputs_total=rec.get("outputs_total"),
+    )
+
+def _output_infos(entries: list[dict]) -> List[OutputInfo]:
+    return [
+        OutputInfo(index=e["index"], name=e["name"], size=e["size"], download_url=presign_download(e["key"]))
+        for e in entries
+    ]
+
+def _celery_info(job_id: str, state: str, result) -> JobInfo:
+    st = _STATUS_MAP.get(state, "queued")
+    info = result if isinstance(result, dict) else {}
+    if st == "done" and info.get("error"):
+        st = "error"  # batch members report failures in their result
+    if st == "cancelled":
+        info = {"error": "Job cancelled"}
+    elif st == "error" and not info:
+        info = {"error": str(result) if result is not None else "Task failed"}
     return JobInfo(
         job_id=job_id,
         status=st,
@@ -94,3 +363,165 @@ def get_status(job_id: str):
         download_url=info.get("download_url"),
         error=info.get("error"),
     )
+
+def _celery_status(job_id: str) -> Optional[JobInfo]:
+    """Status from Celery's result backend, for jobs submitted before job records; None if unknown."""
+    async_result = celery.AsyncResult(job_id)
+    try:
+        state, result = async_result.status, async_result.result
+    except Exception:
+        state, result = "FAILURE", None
+    if state == "PENDING":
+        return None  # Celery's answer for any id it never saw
+    return _celery_info(job_id, state, result)
+
+def _celery_statuses(job_ids: List[str]) -> dict[str, JobInfo]:
+    """``_celery_status`` for many ids: one pipelined GET of their result metas on the Redis backend."""
+    backend = celery.backend
+    if not job_ids:
+        return {}
+    if not isinstance(backend, RedisBackend):  # e.g. the cache backend has a .client without pipelines
+        return {j: info for j in job_ids if (info := _celery_status(j)) is not None}
+    pipe = backend.client.pipeline(transaction=False)
+    for job_id in job_ids:
+        pipe.get(backend.get_key_for_task(job_id))
+    found = {}
+    for job_id, raw in zip(job_ids, pipe.execute()):
+        if raw is None:
+            continue  # never seen
+        try:
+            meta = backend.decode_result(raw)
+        except Exception:
+            meta = {"status": "FAILURE", "result": None}
+        found[job_id] = _celery_info(job_id, meta["status"], meta["result"])
+    return found
+
+def _lookup_many(job_ids: List[str], max_age: Optional[float] = None) -> dict[str, JobInfo]:
+    """Known jobs by id: one pipelined read of the job records, one more for ids without one."""
+    records = jobstore.get_many(job_ids, max_age)
+    found = {job_id: _info(job_id, rec) for job_id, rec in records.items() if rec is not None}
+    found.update(_celery_statuses([job_id for job_id, rec in records.items() if rec is None]))
+    return found
+
+def _lookup(job_id: str, max_age: Optional[float] = None) -> Optional[JobInfo]:
+    return _lookup_many([job_id], max_age).get(job_id)
+
+def _status_list(ids: List[str]) -> JobStatusList:
+    ids = [i for i in dict.fromkeys(ids) if i]
+    if len(ids) > settings.max_status_ids:
+        raise HTTPException(status_code=400, detail=f"At most {settings.max_status_ids} ids per request")
+    found = _lookup_many(ids)
+    return JobStatusList(jobs=[found[i] for i in ids if i in found], missing=[i for i in ids if i not in found])
+
+
+@router.get("/", response_model=JobStatusList)
+def list_status(ids: str = Query(..., description="Comma-separated job ids")):
+    return _status_list(ids.split(","))
+
+
+@router.post("/status", response_model=JobStatusList)
+def bulk_status(body: JobStatusRequest):
+    return _status_list(body.ids)
+
+
+@router.get("/{job_id}", response_model=JobInfo)
+def get_status(job_id: str):
+    info = _lookup(job_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if info.outputs_ready and settings.job_outputs_inline > 0:
+        _, entries = jobstore.outputs(job_id, 0, settings.job_outputs_inline)
+        info.outputs = _output_infos(entries)
+    return info
+
+
+@router.get("/{job_id}/outputs", response_model=OutputList)
+def list_outputs(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1)):
+    """Outputs published so far, in order; poll with ``offset=outputs_ready`` for new ones."""
+    info = _lookup(job_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    ready, entries = jobstore.outputs(job_id, offset, min(limit, settings.max_outputs_page))
+    return OutputList(
+        job_id=job_id, status=info.status, outputs_ready=ready, outputs_total=info.outputs_total,
+        offset=offset, outputs=_output_infos(entries),
+    )
+
+
+@router.delete("/{job_id}", response_model=JobInfo)
+def cancel_job(job_id: str):
+    current = _lookup(job_id, max_age=0)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current.status in ("done", "error", "cancelled"):
+        return current
+    # The flag stops a running job within about a second through its cancel path
+    # (engines killed, work dir and partial zip cleaned up); the worker SIGTERMs
+    # one that ignores it for cancel_grace_seconds. revoke drops a queued task.
+    request_cancel(job_id)
+    celery.control.revoke(job_id)
+    admission.dequeued(job_id)
+    jobstore.update(job_id, status="cancelled", error="Job cancelled", finished=time.time())
+    return JobInfo(job_id=job_id, status="cancelled", progress=current.progress, error="Job cancelled", target=current.target)
+
+
+async def _job_updates(job_id: str):
+    """Current state first, then pushed events until the job is finished.
+
+    Subscribes before reading the snapshot so no transition can fall between them.
+    Yields None every 15s without events (keep-alive).
+    """
+    hub = get_hub()
+    queue = await hub.subscribe(job_id)
+    try:
+        current = await run_in_threadpool(_lookup, job_id, 0)
+        if current is None:
+            return  # expired since the endpoint checked
+        snapshot = current.model_dump()
+        yield snapshot
+        if snapshot["status"] in TERMINAL:
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event.get("status") in TERMINAL:
+                return
+    finally:
+        await hub.unsubscribe(job_id, queue)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    if await run_in_threadpool(_lookup, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        async for event in _job_updates(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{job_id}/ws")
+async def job_ws(websocket: WebSocket, job_id: str):
+    if await run_in_threadpool(_lookup, job_id) is None:
+        await websocket.close(code=1008, reason="Job not found")
+        return
+    await websocket.accept()
+    try:
+        async for event in _job_updates(job_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, HTTPException, Response
+from ..services import metrics
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="prometheus_client is not installed")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,92 @@
+import asyncio, os, uuid
+import aiofiles
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from ..models import UploadCreate, UploadInfo, PartUrlsRequest
+from ..services import uploads
+from ..services.uploads import UploadError, UploadSession
+from ..services.storage import get_backend
+
+router = APIRouter()
+
+def _info(s: UploadSession, received: list[dict] | None = None) -> UploadInfo:
+    return UploadInfo(
+        upload_id=s.upload_id, filename=s.filename, size=s.size, part_size=s.part_size, parts=s.parts,
+        status=s.status, direct=s.direct, parts_received=sorted(p["part"] for p in received or []),
+        key=s.key if s.status == "complete" else None,
+    )
+
+async def _session(upload_id: str) -> UploadSession:
+    s = await run_in_threadpool(uploads.load, upload_id)
+    if s is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return s
+
+@router.post("/", response_model=UploadInfo)
+async def create_upload(body: UploadCreate):
+    try:
+        s = await run_in_threadpool(uploads.create, body.filename, body.size, body.content_type)
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return _info(s)
+
+@router.get("/{upload_id}", response_model=UploadInfo)
+async def get_upload(upload_id: str):
+    """Session state with the parts already stored; a resuming client sends only the rest."""
+    s = await _session(upload_id)
+    return _info(s, await run_in_threadpool(uploads.received, s))
+
+@router.post("/{upload_id}/parts")
+async def part_urls(upload_id: str, body: PartUrlsRequest):
+    """Upload URL per part: presigned S3 URLs (direct) or this API's PUT endpoint."""
+    s = await _session(upload_id)
+    if s.status != "open":
+        raise HTTPException(status_code=409, detail="Upload is already complete")
+    try:
+        urls = await run_in_threadpool(uploads.part_urls, s, body.parts)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"urls": urls}
+
+@router.put("/{upload_id}/parts/{part}")
+async def put_part(upload_id: str, part: int, request: Request):
+    s = await _session(upload_id)
+    if s.direct:
+        raise HTTPException(status_code=409, detail="Parts go straight to object storage; request part URLs")
+    if s.status != "open":
+        raise HTTPException(status_code=409, detail="Upload is already complete")
+    if not 1 <= part <= s.parts:
+        raise HTTPException(status_code=400, detail=f"Part numbers must be between 1 and {s.parts}")
+    expected = s.part_bytes(part)
+    dst = get_backend().part_path(s.ref, part)
+    # Written aside and renamed: a retried or interrupted part never leaves a torn file
+    tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}")
+    size = 0
+    try:
+        async with aiofiles.open(tmp, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > expected:
+                    raise HTTPException(status_code=413, detail=f"Part {part} must be {expected} bytes")
+                await f.write(chunk)
+        if size != expected:
+            raise HTTPException(status_code=400, detail=f"Part {part} must be {expected} bytes, got {size}")
+        await asyncio.to_thread(os.replace, tmp, dst)
+    finally:
+        await asyncio.to_thread(tmp.unlink, missing_ok=True)
+    return {"part": part, "size": size}
+
+@router.post("/{upload_id}/complete", response_model=UploadInfo)
+async def complete_upload(upload_id: str):
+    s = await _session(upload_id)
+    try:
+        s = await run_in_threadpool(uploads.complete, s)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _info(s, await run_in_threadpool(uploads.received, s))
+
+@router.delete("/{upload_id}")
+async def delete_upload(upload_id: str):
+    s = await _session(upload_id)
+    await run_in_threadpool(uploads.abort, s)
+    return {"ok": True}
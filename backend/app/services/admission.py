@@ -0,0 +1,123 @@
+"""Admission control for job submissions.
+
+Three checks, cheapest first, all against Redis and all failing open:
+
+* per-client token bucket (one atomic Lua call; refills at ``quota_rate``/s
+  up to ``quota_burst``),
+* global overload: messages waiting across every conversion queue,
+* per-engine backlog: waiting messages on the target engine's queues and the
+  input bytes already queued for it (a hash of job_id -> bytes, written at
+  enqueue and cleared when the task starts or is cancelled).
+
+The first two run in AdmissionMiddleware before the request body is read; the
+engine check needs the form's target and runs in the handler before ingest.
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional
+import redis
+from ..config import settings
+from .redis_client import get_redis
+from ..workers.celery_app import ENGINE_WORKER, LANES
+
+_QUOTA_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry)
+"""
+_quota_script = None
+
+@dataclass
+class Rejection:
+    detail: str
+    retry_after: int
+
+def _queued_key(engine: str) -> str:
+    return f"convertbuddy:queued:{engine}"
+
+def _queues(engine: str) -> list[str]:
+    return [f"{engine}.{lane}" for lane in LANES]
+
+def _quota(client: str, pipe) -> None:
+    global _quota_script
+    if _quota_script is None:
+        _quota_script = get_redis().register_script(_QUOTA_LUA)
+    _quota_script(keys=[f"convertbuddy:quota:{client}"], args=[settings.quota_rate, settings.quota_burst, 1], client=pipe)
+
+def admit_request(client: str) -> Optional[Rejection]:
+    """Quota + global overload check, one round trip."""
+    quota_on = settings.quota_rate > 0
+    queues = [q for e in ENGINE_WORKER for q in _queues(e)] if settings.admission_max_queued_total > 0 else []
+    if not quota_on and not queues:
+        return None
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        if quota_on:
+            _quota(client, pipe)
+        for q in queues:
+            pipe.llen(q)
+        res = pipe.execute()
+    except redis.RedisError:
+        return None
+    if quota_on:
+        wait = float(res.pop(0))
+        if wait > 0:
+            return Rejection("Too many submissions; slow down", max(math.ceil(wait), 1))
+    waiting = sum(res)
+    if queues and waiting >= settings.admission_max_queued_total:
+        return Rejection(f"Service is overloaded ({waiting} jobs waiting); try again later", settings.admission_retry_after)
+    return None
+
+def check_capacity(engine: Optional[str]) -> Optional[Rejection]:
+    """Backlog check for one engine: waiting messages and queued input bytes."""
+    if engine is None or (settings.admission_max_queued <= 0 and settings.admission_max_queued_bytes <= 0):
+        return None
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for q in _queues(engine):
+            pipe.llen(q)
+        pipe.hvals(_queued_key(engine))
+        *depths, sizes = pipe.execute()
+    except redis.RedisError:
+        return None
+    waiting = sum(depths)
+    queued_bytes = sum(int(s) for s in sizes)
+    if settings.admission_max_queued > 0 and waiting >= settings.admission_max_queued:
+        return Rejection(f"The {engine} queue is full ({waiting} jobs waiting); try again later", settings.admission_retry_after)
+    if settings.admission_max_queued_bytes > 0 and queued_bytes >= settings.admission_max_queued_bytes:
+        return Rejection(f"The {engine} queue is full ({queued_bytes} bytes waiting); try again later", settings.admission_retry_after)
+    return None
+
+def enqueued(engine: Optional[str], sizes: dict[str, int], pipe=None) -> None:
+    """Record input bytes of jobs just sent to ``engine``'s queue."""
+    if engine is None or not sizes:
+        return
+    r = pipe if pipe is not None else get_redis()
+    r.hset(_queued_key(engine), mapping={j: int(s or 0) for j, s in sizes.items()})
+
+def dequeued(*job_ids: str) -> None:
+    """Jobs started or cancelled: no longer count towards any backlog."""
+    if not job_ids:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for engine in ENGINE_WORKER:
+            pipe.hdel(_queued_key(engine), *job_ids)
+        pipe.execute()
+    except redis.RedisError:
+        pass
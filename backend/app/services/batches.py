@@ -0,0 +1,16 @@
+"""Batch records: which jobs belong to a batch, kept in Redis for expiry_hours."""
+import json
+from typing import Optional
+from ..config import settings
+from .redis_client import get_redis
+
+def _key(batch_id: str) -> str:
+    return f"convertbuddy:batch:{batch_id}"
+
+def save_batch(batch_id: str, target: str, job_ids: list[str], names: list[str]) -> None:
+    record = {"target": target, "jobs": job_ids, "names": names}
+    get_redis().set(_key(batch_id), json.dumps(record), ex=settings.expiry_hours * 3600)
+
+def load_batch(batch_id: str) -> Optional[dict]:
+    raw = get_redis().get(_key(batch_id))
+    return json.loads(raw) if raw else None
@@ -0,0 +1,16 @@
+"""Cross-process cancellation flags for jobs (set by the API, polled by engines)."""
+import redis
+from ..config import settings
+from .redis_client import get_redis
+
+def _key(job_id: str) -> str:
+    return f"convertbuddy:cancel:{job_id}"
+
+def request_cancel(job_id: str) -> None:
+    get_redis().set(_key(job_id), 1, ex=settings.expiry_hours * 3600)
+
+def is_cancelled(job_id: str) -> bool:
+    try:
+        return bool(get_redis().exists(_key(job_id)))
+    except redis.RedisError:
+        return False
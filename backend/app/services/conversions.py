@@ -1,23 +1,341 @@
 from pathlib import Path
-import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import json, math, os, re, selectors, shutil, signal, subprocess, threading, time
+from ..config import settings
 
 class ConversionError(Exception):
     pass
 
-def run(args: list[str]):
-    proc = subprocess.run(args, capture_output=True, text=True)
+class ConversionTimeout(ConversionError):
+    pass
+
+class ConversionCancelled(ConversionError):
+    pass
+
+@dataclass
+class EngineUsage:
+    """Resources used by the engine processes of one job (from wait4)."""
+    runs: int = 0
+    cpu_s: float = 0.0
+    peak_rss_kb: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, ru):
+        with self._lock:
+            self.runs += 1
+            self.cpu_s += ru.ru_utime + ru.ru_stime
+            self.peak_rss_kb = max(self.peak_rss_kb, ru.ru_maxrss)
+
+    def as_dict(self) -> dict:
+        return {"engine_runs": self.runs, "child_cpu_s": round(self.cpu_s, 3), "child_peak_rss_kb": self.peak_rss_kb}
+
+@dataclass
+class EngineScope:
+    deadline: float
+    cpu_seconds: int
+    should_cancel: Optional[Callable[[], bool]] = None
+    last_cancel_check: float = 0.0
+    usage: EngineUsage = field(default_factory=EngineUsage)
+
+_scope: ContextVar[Optional[EngineScope]] = ContextVar("engine_scope", default=None)
+
+# Process groups of engines running in this process, killed on SIGTERM/revoke
+_active: set[int] = set()
+_active_lock = threading.Lock()
+
+@contextmanager
+def engine_scope(should_cancel: Optional[Callable[[], bool]] = None, timeout: Optional[int] = None, cpu_seconds: Optional[int] = None):
+    """Apply one wall-clock deadline, CPU limit and cancel check to every engine run inside."""
+    scope = EngineScope(
+        deadline=time.monotonic() + (timeout or settings.engine_timeout),
+        cpu_seconds=settings.engine_cpu_seconds if cpu_seconds is None else cpu_seconds,
+        should_cancel=should_cancel,
+    )
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+def check_scope():
+    """Deadline/cancel check for work done in-process rather than by an engine subprocess."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    now = time.monotonic()
+    if now > scope.deadline:
+        raise ConversionTimeout("Conversion exceeded the time limit")
+    if scope.should_cancel and now - scope.last_cancel_check >= 1.0:
+        scope.last_cancel_check = now
+        if scope.should_cancel():
+            raise ConversionCancelled("Job cancelled")
+
+@contextmanager
+def active_engines(*pgids: int):
+    """Count long-lived processes started elsewhere (e.g. pooled soffice) as this
+    process's engines while they work for the current job, so kill_active reaches them."""
+    with _active_lock:
+        _active.update(pgids)
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active.difference_update(pgids)
+
+def kill_active():
+    with _active_lock:
+        groups = list(_active)
+    for pgid in groups:
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except OSError:
+            pass
+
+def _limit_cpu(pid: int, seconds: int):
+    if seconds <= 0:
+        return
+    try:
+        import resource
+        resource.prlimit(pid, resource.RLIMIT_CPU, (seconds, seconds + 5))
+    except (ImportError, AttributeError, OSError):
+        pass
+
+def _reap(proc: subprocess.Popen, deadline: float):
+    """Wait for an engine whose pipes are closed, returning its rusage (CPU time, peak RSS)."""
+    delay = 0.001
+    while True:
+        pid, status, ru = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return ru
+        if time.monotonic() > deadline:
+            raise ConversionTimeout(f"{proc.args[0]} exceeded the time limit")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+def run(
+    args: list[str],
+    on_stdout: Optional[Callable[[str], None]] = None,
+    on_stderr: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Run an engine, streaming its output line by line.
+
+    stderr is kept only as a bounded tail for error messages; stdout is returned
+    unless ``on_stdout`` consumes it. The engine runs in its own process group
+    so a timeout or cancellation kills it together with any children.
+    """
+    scope = _scope.get() or EngineScope(deadline=time.monotonic() + settings.engine_timeout, cpu_seconds=settings.engine_cpu_seconds)
+    try:
+        proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    except FileNotFoundError:
+        raise ConversionError(f"Engine not installed: {args[0]}")
+    with _active_lock:
+        _active.add(proc.pid)
+    _limit_cpu(proc.pid, scope.cpu_seconds)
+
+    out: list[str] = []
+    err_tail: deque[str] = deque(maxlen=40)
+    handlers = {
+        proc.stdout.fileno(): on_stdout or out.append,
+        proc.stderr.fileno(): lambda line: (err_tail.append(line), on_stderr and on_stderr(line)),
+    }
+    partial = {fd: b"" for fd in handlers}
+    sel = selectors.DefaultSelector()
+    for f in (proc.stdout, proc.stderr):
+        sel.register(f, selectors.EVENT_READ)
+    next_cancel_check = 0.0
+    try:
+        while sel.get_map():
+            for key, _ in sel.select(timeout=0.5):
+                fd = key.fd
+                data = os.read(fd, 65536)
+                if not data:
+                    sel.unregister(key.fileobj)
+                    if partial[fd]:
+                        handlers[fd](partial[fd].decode(errors="replace"))
+                    continue
+                # ffmpeg/magick use \r for in-place updates; treat it as a line break
+                lines = (partial[fd] + data).replace(b"\r", b"\n").split(b"\n")
+                partial[fd] = lines.pop()
+                for line in lines:
+                    if line:
+                        handlers[fd](line.decode(errors="replace"))
+            now = time.monotonic()
+            if now > scope.deadline:
+                raise ConversionTimeout(f"{args[0]} exceeded the time limit")
+            if scope.should_cancel and now >= next_cancel_check:
+                next_cancel_check = now + 1.0
+                if scope.should_cancel():
+                    raise ConversionCancelled("Job cancelled")
+        scope.usage.add(_reap(proc, scope.deadline))
+    except BaseException:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        proc.wait()
+        raise
+    finally:
+        sel.close()
+        proc.stdout.close()
+        proc.stderr.close()
+        with _active_lock:
+            _active.discard(proc.pid)
+
     if proc.returncode != 0:
-        raise ConversionError(proc.stderr.strip() or f"Command failed: {' '.join(args)}")
-    return proc.stdout.strip()
+        if proc.returncode == -signal.SIGXCPU:
+            raise ConversionTimeout(f"{args[0]} exceeded the CPU limit")
+        raise ConversionError("\n".join(err_tail).strip() or f"Command failed: {' '.join(args)}")
+    return "\n".join(out).strip()
 
-def mp4_to_mp3(src: Path, dst: Path, bitrate: str = "192k"):
-    run([
-        "ffmpeg", "-y",
-        "-i", str(src),
-        "-vn",
-        "-ab", str(bitrate),
-        str(dst),
-    ])
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+class FfmpegProgress:
+    """Turns ``-progress pipe:1`` key=value lines into a 0..1 fraction."""
+    def __init__(self, on_progress: Callable[[float], None], duration: float = 0.0):
+        self.on_progress = on_progress
+        self.duration = duration
+
+    def stderr(self, line: str):
+        if not self.duration and (m := _DURATION_RE.search(line)):
+            h, mnt, sec = m.groups()
+            self.duration = int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+    def stdout(self, line: str):
+        key, _, value = line.partition("=")
+        if key == "out_time_us" and self.duration and value.isdigit():
+            self.on_progress(min(int(value) / 1e6 / self.duration, 1.0))
+        elif key == "progress" and value == "end":
+            self.on_progress(1.0)
+
+_MAGICK_RE = re.compile(r"(\d+)% complete")
+
+def probe(src: Path | str) -> dict:
+    """Duration and streams of a media file via ffprobe (``src`` may be a URL)."""
+    out = run(["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", str(src)])
+    try:
+        raw = json.loads(out or "{}")
+    except ValueError:
+        raise ConversionError("Could not read media metadata")
+
+    def num(v) -> float:
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return 0.0
+
+    fmt = raw.get("format") or {}
+    streams = raw.get("streams") or []
+    return {
+        "duration": num(fmt.get("duration")),
+        "format": fmt.get("format_name", ""),
+        "bit_rate": int(num(fmt.get("bit_rate"))),
+        "audio": [
+            {"index": st.get("index"), "codec": st.get("codec_name", ""), "bit_rate": int(num(st.get("bit_rate"))),
+             "sample_rate": int(num(st.get("sample_rate"))), "channels": st.get("channels", 0)}
+            for st in streams if st.get("codec_type") == "audio"
+        ],
+        "video": [
+            {"index": st.get("index"), "codec": st.get("codec_name", ""), "width": st.get("width", 0), "height": st.get("height", 0)}
+            for st in streams if st.get("codec_type") == "video"
+        ],
+    }
+
+def _bits_per_second(rate: str) -> int:
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*", str(rate))
+    if not m:
+        raise ConversionError(f"Invalid bitrate: {rate}")
+    return int(float(m.group(1)) * {"": 1, "k": 1000, "m": 1000 ** 2}[m.group(2).lower()])
+
+# First audio stream only: video, subtitle and data streams are never demuxed into the pipeline
+_AUDIO_ONLY = ["-map", "0:a:0", "-vn", "-sn", "-dn"]
+
+def mp4_to_mp3(
+    src: Path,
+    dst: Path,
+    bitrate: Optional[str] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+    media: Optional[dict] = None,
+):
+    media = media or probe(src)
+    if not media["audio"]:
+        raise ConversionError("Input has no audio track")
+    audio = media["audio"][0]
+    duration = media["duration"]
+    report = on_progress or (lambda f: None)
+
+    if audio["codec"] == "mp3" and (bitrate is None or 0 < audio["bit_rate"] <= _bits_per_second(bitrate)):
+        # Already MP3 at or below the requested rate: remux the stream, no decode or encode
+        prog = FfmpegProgress(report, duration)
+        run(["ffmpeg", "-y", "-nostats", "-progress", "pipe:1", "-i", str(src), *_AUDIO_ONLY, "-c:a", "copy", str(dst)],
+            on_stdout=prog.stdout, on_stderr=prog.stderr)
+        return
+
+    lame = ["-c:a", "libmp3lame", "-b:a", bitrate or "192k"]
+    workers = settings.ffmpeg_segment_workers or os.cpu_count() or 1
+    if settings.ffmpeg_split_min_seconds > 0 and duration >= settings.ffmpeg_split_min_seconds and workers > 1:
+        _encode_segments(src, dst, lame, duration, workers, report)
+        return
+    prog = FfmpegProgress(report, duration)
+    run(["ffmpeg", "-y", "-nostats", "-progress", "pipe:1", "-i", str(src), *_AUDIO_ONLY, *lame, str(dst)],
+        on_stdout=prog.stdout, on_stderr=prog.stderr)
+
+# Share of mp4->mp3 progress spent decoding segments; the single MP3 encode is the rest
+_DECODE_SHARE = 0.3
+
+def _encode_segments(src: Path, dst: Path, lame: list[str], duration: float, workers: int, report: Callable[[float], None]):
+    """Decode fixed-length time slices to PCM in parallel, then encode the joined audio to MP3 once.
+
+    MP3 segments can not be joined seamlessly (every LAME stream starts with
+    encoder delay and ends padded to a frame), so only the demux/decode runs
+    in parallel; PCM joins sample-exact.
+    """
+    seg = settings.ffmpeg_segment_seconds
+    n = math.ceil(duration / seg)
+    work = dst.parent / f".{dst.stem}-segments"
+    work.mkdir(parents=True, exist_ok=True)
+    done = [0.0] * n
+    lock = threading.Lock()
+
+    def encode_one(i: int) -> Path:
+        start = i * seg
+        length = min(seg, duration - start)
+
+        def progress(f: float):
+            with lock:
+                done[i] = f * length
+                total = sum(done)
+            report(_DECODE_SHARE * total / duration)
+
+        prog = FfmpegProgress(progress, length)
+        out = work / f"seg{i:05d}.wav"
+        # -ss before -i seeks the input, and decoding trims to the exact sample
+        run(["ffmpeg", "-y", "-nostats", "-progress", "pipe:1", "-ss", f"{start:.3f}", "-t", f"{length:.3f}",
+             "-i", str(src), *_AUDIO_ONLY, "-c:a", "pcm_s16le", str(out)], on_stdout=prog.stdout)
+        return out
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, n)) as pool:
+            # copy_context: each thread's engines run under the job's deadline/cancel scope
+            futures = [pool.submit(copy_context().run, encode_one, i) for i in range(n)]
+            try:
+                segments = [f.result() for f in futures]
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+        listing = work / "segments.txt"
+        listing.write_text("".join(f"file '{p.name}'\n" for p in segments))
+        prog = FfmpegProgress(lambda f: report(_DECODE_SHARE + (1 - _DECODE_SHARE) * f), duration)
+        run(["ffmpeg", "-y", "-nostats", "-progress", "pipe:1", "-f", "concat", "-safe", "0", "-i", str(listing), *lame, str(dst)],
+            on_stdout=prog.stdout)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
 
 def pdf_to_jpg(src: Path, dst_dir: Path, dpi: int = 200):
     dst_dir.mkdir(parents=True, exist_ok=True)
@@ -29,30 +347,155 @@ def pdf_to_jpg(src: Path, dst_dir: Path, dpi: int = 200):
         str(dst_dir / "page")
     ])
 
-def jpg_to_pdf(src: Path, dst: Path, dpi: int = 300):
+_PAGE_RE = re.compile(r"-(\d+)\.jpg$")
+
+def pdf_page_count(src: Path) -> int:
+    out = run(["pdfinfo", str(src)])
+    m = re.search(r"^Pages:\s+(\d+)", out, re.M)
+    if not m:
+        raise ConversionError("Could not read page count")
+    return int(m.group(1))
+
+def sorted_pages(dst_dir: Path) -> list[Path]:
+    # Numeric sort: pdftoppm zero-pads by document length, but never trust lexical order
+    pages = list(dst_dir.glob("page*.jpg"))
+    return sorted(pages, key=lambda p: int(m.group(1)) if (m := _PAGE_RE.search(p.name)) else 0)
+
+def _raster_range(src: Path, dst_dir: Path, dpi: int, first: int, last: int, on_page: Callable[[str], None]):
+    # -progress prints "<page> <last> <file>" to stderr as each page is written
+    run([
+        "pdftoppm",
+        "-progress",
+        "-jpeg",
+        "-r", str(dpi),
+        "-f", str(first),
+        "-l", str(last),
+        str(src),
+        str(dst_dir / "page")
+    ], on_stderr=lambda line: on_page(line) if line[:1].isdigit() else None)
+
+def pdf_to_jpg_parallel(
+    src: Path,
+    dst_dir: Path,
+    dpi: int = 200,
+    workers: int = 0,
+    chunk_pages: int = 8,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_ready: Optional[Callable[[list[Path], int], None]] = None,
+) -> list[Path]:
+    """Rasterize page ranges with concurrent pdftoppm processes; returns pages in order.
+
+    Threads only wait on the child processes, so this is safe inside Celery's
+    daemonic prefork children (which may not start a multiprocessing pool).
+    ``on_ready(pages, total)`` receives finished pages in document order as soon
+    as every earlier page is done, so callers can package while rendering.
+    """
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    try:
+        total = pdf_page_count(src)
+    except ConversionError:
+        total = 0
+    if total <= 1 or workers <= 1:
+        pdf_to_jpg(src, dst_dir, dpi=dpi)
+        pages = sorted_pages(dst_dir)
+        if on_progress:
+            on_progress(len(pages), len(pages))
+        if on_ready:
+            on_ready(pages, len(pages))
+        return pages
+
+    # Small enough chunks to keep every worker busy until the tail of the document
+    size = max(1, min(chunk_pages, math.ceil(total / workers)))
+    ranges = [(first, min(first + size - 1, total)) for first in range(1, total + 1, size)]
+    ready: dict[int, Path] = {}
+    next_page = 1
+    lock = threading.Lock()
+
+    def on_page(line: str):
+        # "<page> <last> <file>"
+        parts = line.split(maxsplit=2)
+        if len(parts) == 3 and parts[0].isdigit():
+            with lock:
+                ready[int(parts[0])] = Path(parts[2])
+
+    def emit():
+        nonlocal next_page
+        with lock:
+            batch = []
+            while next_page in ready:
+                batch.append(ready[next_page])
+                next_page += 1
+            done = len(ready)
+        if on_ready and batch:
+            on_ready(batch, total)
+        if on_progress:
+            on_progress(min(done, total), total)
+
+    # Pool threads inherit the engine scope (deadline, cancel check) via the copied context;
+    # progress is reported from this thread only.
+    with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        pending = {pool.submit(copy_context().run, _raster_range, src, dst_dir, dpi, first, last, on_page) for first, last in ranges}
+        try:
+            while pending:
+                finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    fut.result()
+                emit()
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    # Every page reported its file: no need to list the directory
+    pages = [ready[n] for n in range(1, total + 1)] if len(ready) == total else sorted_pages(dst_dir)
+    if on_ready and next_page <= len(pages):
+        # pdftoppm without per-page progress lines: hand over whatever is left
+        on_ready(pages[next_page - 1:], total)
+    return pages
+
+def _magick_progress(on_progress: Optional[Callable[[float], None]]):
+    if not on_progress:
+        return None
+    return lambda line: on_progress(int(m.group(1)) / 100) if (m := _MAGICK_RE.search(line)) else None
+
+def jpg_to_pdf(src: Path, dst: Path, dpi: int = 300, on_progress: Optional[Callable[[float], None]] = None):
     run([
         "magick",
         str(src),
+        "-monitor",
         "-units", "PixelsPerInch",
         "-density", str(dpi),
         str(dst),
-    ])
+    ], on_stderr=_magick_progress(on_progress))
 
-def images_to_pdf(src_list: list[Path], dst: Path, dpi: int = 300):
+def images_to_pdf(src_list: list[Path], dst: Path, dpi: int = 300, on_progress: Optional[Callable[[float], None]] = None):
     # Convert multiple images into a single multi-page PDF, preserving order.
     if not src_list:
         raise ConversionError("No images provided")
     args = ["magick"]
     for p in src_list:
         args.append(str(p))
-    args += ["-units", "PixelsPerInch", "-density", str(dpi), str(dst)]
-    run(args)
+    args += ["-monitor", "-units", "PixelsPerInch", "-density", str(dpi), str(dst)]
+    run(args, on_stderr=_magick_progress(on_progress))
 
 def docx_to_pdf(src: Path, out_dir: Path):
-    run([
-        "soffice",
-        "--headless",
-        "--convert-to", "pdf",
-        "--outdir", str(out_dir),
-        str(src),
-    ])
+    from .office_pool import get_office_pool, OfficeUnavailable, OfficeTimeout
+    pool = get_office_pool()
+    if pool is not None:
+        try:
+            pool.convert(src, out_dir / f"{src.stem}.pdf")
+            return
+        except OfficeTimeout as e:
+            raise ConversionError(str(e))
+        except OfficeUnavailable:
+            pass  # fall back to a cold, isolated soffice run
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix="lo-profile-") as profile:
+        # Private profile per run: concurrent cold starts must not share ~/.config/libreoffice
+        run([
+            "soffice",
+            "--headless",
+            f"-env:UserInstallation={Path(profile).as_uri()}",
+            "--convert-to", "pdf",
+            "--outdir", str(out_dir),
+            str(src),
+        ])
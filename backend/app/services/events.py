@@ -0,0 +1,97 @@
+"""Job progress events over Redis pub/sub.
+
+Workers publish a JobInfo-shaped dict on ``convertbuddy:events:<job_id>`` for
+every progress or state change. Each API process holds one shared pub/sub
+connection (EventHub) and fans messages out to in-memory queues, subscribing to
+a job's channel only while at least one local client is watching it.
+"""
+import asyncio, json
+import redis
+from ..config import settings
+from .redis_client import get_redis
+
+TERMINAL = ("done", "error", "cancelled")
+
+def channel(job_id: str) -> str:
+    return f"convertbuddy:events:{job_id}"
+
+def publish(job_id: str, status: str, progress: int = 0, **fields) -> None:
+    payload = {"job_id": job_id, "status": status, "progress": progress, **fields}
+    try:
+        get_redis().publish(channel(job_id), json.dumps(payload))
+    except redis.RedisError:
+        pass  # events are best effort; the status endpoint stays authoritative
+
+class EventHub:
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subs: dict[str, set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        if self._pubsub is None:
+            import redis.asyncio as aioredis
+            self._pubsub = aioredis.Redis.from_url(settings.redis_url, decode_responses=True).pubsub(ignore_subscribe_messages=True)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def subscribe(self, job_id: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            await self._ensure_started()
+            subs = self._subs.setdefault(job_id, set())
+            if not subs:
+                await self._pubsub.subscribe(channel(job_id))
+            subs.add(q)
+        return q
+
+    async def unsubscribe(self, job_id: str, q: asyncio.Queue) -> None:
+        async with self._lock:
+            subs = self._subs.get(job_id)
+            if not subs:
+                return
+            subs.discard(q)
+            if not subs:
+                del self._subs[job_id]
+                try:
+                    await self._pubsub.unsubscribe(channel(job_id))
+                except Exception:
+                    pass
+
+    def _deliver(self, job_id: str, payload: dict):
+        for q in list(self._subs.get(job_id, ())):
+            if q.full():
+                # Slow client: progress is superseded by newer events, drop the oldest
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait(payload)
+
+    async def _read_loop(self):
+        prefix = channel("")
+        while True:
+            try:
+                msg = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(1.0)
+                continue
+            if not msg or msg.get("type") != "message":
+                continue
+            try:
+                payload = json.loads(msg["data"])
+            except (TypeError, ValueError):
+                continue
+            self._deliver(msg["channel"][len(prefix):], payload)
+
+_hub: EventHub | None = None
+
+def get_hub() -> EventHub:
+    global _hub
+    if _hub is None:
+        _hub = EventHub()
+    return _hub
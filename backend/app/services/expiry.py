@@ -0,0 +1,25 @@
+"""Expiry index: a Redis sorted set of job_id -> creation time.
+
+Written when a job is created so cleanup can pull exactly the expired ids
+instead of listing or stat-ing every job in storage.
+"""
+import time
+from ..config import settings
+from .redis_client import get_redis
+
+_KEY = "convertbuddy:expiry"
+
+def track(*job_ids: str, created: float | None = None) -> None:
+    if job_ids:
+        ts = created or time.time()
+        get_redis().zadd(_KEY, {j: ts for j in job_ids})
+
+def due(before: float, limit: int | None = None) -> list[str]:
+    return get_redis().zrangebyscore(_KEY, "-inf", before, start=0, num=limit or settings.cleanup_batch_size)
+
+def forget(job_ids: list[str]) -> None:
+    if job_ids:
+        get_redis().zrem(_KEY, *job_ids)
+
+def size() -> int:
+    return get_redis().zcard(_KEY)
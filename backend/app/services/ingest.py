@@ -0,0 +1,229 @@
+"""Single-pass, non-blocking upload ingest.
+
+The multipart body is parsed as it arrives from the client (``FormStream``),
+without spooling it to a temp file first. Each file part is read once in
+chunks: the first chunk is MIME-sniffed (and can be rejected before anything is
+written), every chunk is hashed and size-checked, then streamed to the storage
+backend's async writer.
+"""
+import asyncio, hashlib, re, time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import parse_qsl
+from fastapi import Request
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+from ..config import settings
+from .storage import open_writer
+from . import metrics
+
+SNIFF_BYTES = 8192
+# Page objects in uncompressed xref sections; object streams hide some, so this is a lower bound
+_PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+class UploadTooLarge(Exception):
+    pass
+
+class BadForm(Exception):
+    pass
+
+@dataclass
+class Ingested:
+    path: Path
+    filename: str
+    mime: str
+    sha256: str
+    size: int
+    pages: Optional[int] = None
+
+class PageCounter:
+    """Counts PDF page objects across chunk boundaries."""
+    def __init__(self):
+        self.count = 0
+        self._tail = b""
+
+    def feed(self, chunk: bytes):
+        data = self._tail + chunk
+        # Matches starting in the last 16 bytes may continue in the next chunk; rescan them then
+        cut = max(len(data) - 16, 0)
+        self.count += sum(1 for m in _PDF_PAGE_RE.finditer(data) if m.start() < cut)
+        self._tail = data[cut:]
+
+    def finish(self) -> int:
+        return self.count + len(_PDF_PAGE_RE.findall(self._tail))
+
+class FormPart:
+    """One part of a multipart body; its data is read straight off the request stream."""
+    def __init__(self, form: "FormStream", headers: dict[bytes, bytes]):
+        _, params = parse_options_header(headers.get(b"content-disposition", b""))
+        self.name = params.get(b"name", b"").decode(errors="replace")
+        filename = params.get(b"filename")
+        self.filename = filename.decode(errors="replace") if filename is not None else None
+        self.content_type = headers.get(b"content-type", b"").decode(errors="replace")
+        self._form = form
+        self._buf = bytearray()
+        self._ended = False
+
+    async def read(self, size: int = -1) -> bytes:
+        """Up to ``size`` bytes (all that is left if negative); b"" at the end of the part."""
+        while not self._ended and (size < 0 or len(self._buf) < size):
+            event = await self._form._next_event()
+            if event is None:
+                raise BadForm("Truncated multipart body")
+            kind, data = event
+            if kind == "end":
+                self._ended = True
+            else:
+                self._buf += data
+        n = len(self._buf) if size < 0 else min(size, len(self._buf))
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    async def text(self, limit: int) -> str:
+        data = await self.read(limit + 1)
+        if len(data) > limit:
+            raise BadForm(f"Form field '{self.name}' exceeds {limit} bytes")
+        return data.decode(errors="replace")
+
+    async def drain(self):
+        while await self.read(settings.upload_chunk_bytes):
+            pass
+
+class FormStream:
+    """Iterates the parts of a multipart/form-data request as its body streams in.
+
+    Parts must be consumed in order; moving on skips what is left of the
+    current one.
+    """
+    def __init__(self, request: Request):
+        ctype, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if ctype != b"multipart/form-data" or not boundary:
+            raise BadForm("Expected a multipart/form-data (or, without files, urlencoded) body")
+        self._events: deque = deque()
+        self._headers: dict[bytes, bytes] = {}
+        self._field = self._value = b""
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_data": lambda data, start, end: self._events.append(("data", data[start:end])),
+            "on_part_end": lambda: self._events.append(("end", None)),
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+        self._chunks = request.stream().__aiter__()
+        self._done = False
+        self._part: Optional[FormPart] = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self):
+        self._events.append(("part", self._headers))
+        self._headers = {}
+
+    async def _next_event(self):
+        while not self._events:
+            if self._done:
+                return None
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._done = True
+                self._parser.finalize()
+                continue
+            try:
+                self._parser.write(chunk)
+            except MultipartParseError as e:
+                raise BadForm(f"Malformed multipart body: {e}")
+        return self._events.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> FormPart:
+        if self._part is not None:
+            await self._part.drain()
+        event = await self._next_event()
+        while event is not None and event[0] != "part":
+            event = await self._next_event()
+        if event is None:
+            raise StopAsyncIteration
+        self._part = FormPart(self, event[1])
+        return self._part
+
+def is_urlencoded(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip().lower() == "application/x-www-form-urlencoded"
+
+async def read_urlencoded(request: Request, limit: int) -> dict[str, str]:
+    """Fields of an application/x-www-form-urlencoded body (no files), at most ``limit`` bytes."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise BadForm(f"Form body exceeds {limit} bytes")
+    return dict(parse_qsl(body.decode(errors="replace"), keep_blank_values=True))
+
+def sniff_mime(head: bytes) -> str:
+    import magic
+    return magic.from_buffer(head[:SNIFF_BYTES], mime=True)
+
+async def ingest_upload(
+    job_id: str,
+    upload: FormPart,
+    stored_name: str,
+    check: Optional[Callable[[str], None]] = None,
+    max_bytes: Optional[int] = None,
+    target: str = "",
+) -> Ingested:
+    """Stream ``upload`` into the job's storage as ``stored_name``.
+
+    ``check(mime)`` runs on the sniffed type before any byte is stored and may
+    raise to reject the upload.
+    """
+    limit = max_bytes if max_bytes is not None else settings.max_upload_bytes
+    chunk_size = settings.upload_chunk_bytes
+    chunk = await upload.read(chunk_size)
+    sniff_start = time.perf_counter()
+    mime = await asyncio.to_thread(sniff_mime, chunk)
+    metrics.observe("sniff", time.perf_counter() - sniff_start, target)
+    if check:
+        check(mime)
+
+    h = hashlib.sha256()
+    size = 0
+    pages = PageCounter() if mime == "application/pdf" else None
+    writer = open_writer(job_id, stored_name)
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > limit:
+                raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+            # hashlib releases the GIL on large buffers; it and the page scan stay off the event loop
+            work = [asyncio.to_thread(h.update, chunk), writer.write(chunk)]
+            if pages is not None:
+                work.append(asyncio.to_thread(pages.feed, chunk))
+            await asyncio.gather(*work)
+            chunk = await upload.read(chunk_size)
+        key = await writer.close()
+    except BaseException:
+        await writer.abort()
+        raise
+    return Ingested(
+        path=Path(key), filename=upload.filename or stored_name, mime=mime, sha256=h.hexdigest(), size=size,
+        pages=pages.finish() if pages is not None else None,
+    )
@@ -0,0 +1,123 @@
+"""Compact job records: one Redis hash per job.
+
+Written by the API when a job is submitted and by convert_task as it runs, so
+a status read is one HGETALL and hundreds of them one pipelined round trip,
+independent of Celery's result backend. Unknown ids have no record (instead of
+looking "queued"). Records expire with the job's files. A short per-process
+TTL cache absorbs dashboards polling the same ids.
+
+Multi-output jobs also keep a list of the outputs published so far
+(``<record>:outputs``), appended to while the job is still rendering.
+
+Worker-side writes (``report``, ``start``, ``add_outputs``) are best effort, like
+job events: a Redis hiccup must not fail a conversion, and eager runs (the
+bench) work without Redis at all.
+"""
+import json, time
+import redis
+from typing import Iterable, Optional
+from ..config import settings
+from .redis_client import get_redis
+
+_INT = ("progress", "input_size", "output_bytes", "outputs_ready", "outputs_total")
+_FLOAT = ("created", "started", "finished")
+_CACHE_MAX = 20000
+
+_cache: dict[str, tuple[float, Optional[dict]]] = {}
+
+def _key(job_id: str) -> str:
+    return f"convertbuddy:job:{job_id}"
+
+def _outputs_key(job_id: str) -> str:
+    return f"convertbuddy:job:{job_id}:outputs"
+
+def _ttl() -> int:
+    return settings.expiry_hours * 3600
+
+def _decode(raw: dict) -> dict:
+    rec = dict(raw)
+    for k in _INT:
+        if k in rec:
+            rec[k] = int(rec[k])
+    for k in _FLOAT:
+        if k in rec:
+            rec[k] = float(rec[k])
+    return rec
+
+def update(job_id: str, pipe=None, **fields) -> None:
+    """Set fields on the record (None values are skipped) and refresh its expiry."""
+    fields = {k: str(v) for k, v in fields.items() if v is not None}
+    r = pipe if pipe is not None else get_redis().pipeline(transaction=False)
+    r.hset(_key(job_id), mapping=fields)
+    r.expire(_key(job_id), _ttl())
+    if pipe is None:
+        r.execute()
+    _cache.pop(job_id, None)
+
+def report(job_id: str, **fields) -> None:
+    """``update`` from the worker; failures are ignored."""
+    try:
+        update(job_id, **fields)
+    except redis.RedisError:
+        pass
+
+def create(job_id: str, target: str, input_size: Optional[int] = None, batch_id: Optional[str] = None, pipe=None) -> None:
+    update(job_id, pipe, status="queued", progress=0, target=target, created=time.time(),
+           input_size=input_size, batch_id=batch_id)
+
+def start(job_id: str, started: float) -> None:
+    """Task picked up; outputs from an earlier delivery of the same job are dropped (best effort)."""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.delete(_outputs_key(job_id))
+    pipe.hdel(_key(job_id), "outputs_ready", "outputs_total")
+    update(job_id, pipe, status="processing", started=started)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+def add_outputs(job_id: str, entries: list[dict], ready: int, total: int) -> None:
+    """Append published outputs, in order; ``ready`` counts all published so far (one writer per job, best effort)."""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.rpush(_outputs_key(job_id), *(json.dumps(e, separators=(",", ":")) for e in entries))
+    pipe.expire(_outputs_key(job_id), _ttl())
+    update(job_id, pipe, outputs_ready=ready, outputs_total=total)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+def outputs(job_id: str, offset: int = 0, limit: int = 100) -> tuple[int, list[dict]]:
+    """(outputs ready, the ``limit`` of them starting at ``offset``)."""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.llen(_outputs_key(job_id))
+    pipe.lrange(_outputs_key(job_id), offset, offset + limit - 1)
+    ready, raw = pipe.execute()
+    return ready, [json.loads(e) for e in raw]
+
+def get_many(job_ids: Iterable[str], max_age: Optional[float] = None) -> dict[str, Optional[dict]]:
+    """Records by id (None for unknown ids); ``max_age=0`` bypasses the cache."""
+    ttl = settings.job_status_cache_seconds if max_age is None else max_age
+    now = time.monotonic()
+    out: dict[str, Optional[dict]] = {}
+    misses = []
+    for job_id in dict.fromkeys(job_ids):
+        hit = _cache.get(job_id) if ttl > 0 else None
+        if hit is not None and hit[0] > now:
+            out[job_id] = hit[1]
+        else:
+            misses.append(job_id)
+    if misses:
+        pipe = get_redis().pipeline(transaction=False)
+        for job_id in misses:
+            pipe.hgetall(_key(job_id))
+        if len(_cache) + len(misses) > _CACHE_MAX:
+            _cache.clear()
+        for job_id, raw in zip(misses, pipe.execute()):
+            out[job_id] = _decode(raw) if raw else None
+            if ttl > 0:
+                _cache[job_id] = (now + ttl, out[job_id])
+    return out
+
+def get(job_id: str, max_age: Optional[float] = None) -> Optional[dict]:
+    return get_many([job_id], max_age)[job_id]
@@ -0,0 +1,59 @@
+"""Per-job manifest of stored files.
+
+Each job's storage holds ``manifest.json`` listing its inputs and outputs with
+size and SHA-256. Entries are added as files are stored (inputs at ingest,
+outputs when the task publishes them), one write per batch of files. Downloads
+and cleanup read it instead of stat-ing or walking the job dir.
+"""
+import hashlib, json, time
+from pathlib import Path
+from typing import Iterable, Optional
+from .storage_backend import MANIFEST_NAME
+from .storage import get_backend
+
+ROLES = ("inputs", "outputs")
+
+def _key(job_id: str) -> str:
+    return get_backend().path_for(job_id, MANIFEST_NAME)
+
+def entry(key: str, size: int, sha256: Optional[str], **extra) -> dict:
+    return {"name": Path(key).name, "key": str(key), "size": size, "sha256": sha256, **extra}
+
+def file_entry(path: Path, key: Optional[str] = None, **extra) -> dict:
+    """Entry for a local file (hashed here); ``key`` if it is stored under another name."""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+            size += len(chunk)
+    return entry(key or str(path), size, h.hexdigest(), **extra)
+
+def load(job_id: str) -> Optional[dict]:
+    raw = get_backend().read_bytes(_key(job_id))
+    return json.loads(raw) if raw else None
+
+def record(job_id: str, role: str, entries: Iterable[dict]) -> dict:
+    """Add ``entries`` under ``role``; an entry for an already listed key replaces it (task retries)."""
+    new = list(entries)
+    m = load(job_id) or {"job_id": job_id, "created": time.time(), "inputs": [], "outputs": []}
+    keys = {e["key"] for e in new}
+    m[role] = [e for e in m[role] if e["key"] not in keys] + new
+    get_backend().write_bytes(_key(job_id), json.dumps(m, separators=(",", ":")).encode())
+    return m
+
+def find(m: dict, key: str) -> Optional[dict]:
+    for role in ROLES:
+        for e in m.get(role, []):
+            if e["key"] == key:
+                return e
+    return None
+
+def stored_bytes(path: Path) -> Optional[int]:
+    """Bytes a local manifest file accounts for; None if there is none (older jobs)."""
+    try:
+        raw = Path(path).read_bytes()
+        m = json.loads(raw)
+    except (OSError, ValueError):
+        return None
+    return sum(e.get("size") or 0 for role in ROLES for e in m.get(role, [])) + len(raw)
@@ -0,0 +1,41 @@
+"""Media metadata index: ffprobe results cached in Redis by input content hash.
+
+The worker probes an input once (from its staged local copy) and caches the
+result; the API only reads the cache, never runs ffprobe in a request. For a
+re-upload of the same bytes it can then reject inputs without audio, route
+long media to the slow lane and hand the worker a ready plan.
+"""
+import json
+from pathlib import Path
+from typing import Optional
+import redis
+from ..config import settings
+from .redis_client import get_redis
+from . import conversions
+
+def _key(digest: str) -> str:
+    return f"convertbuddy:media:{digest}"
+
+def cached(digest: str) -> Optional[dict]:
+    """Probe result of an earlier job on the same bytes, if any."""
+    try:
+        raw = get_redis().get(_key(digest))
+        return json.loads(raw) if raw else None
+    except (redis.RedisError, ValueError):
+        return None
+
+def describe(digest: str, src: Path) -> Optional[dict]:
+    """Probe result for a staged input; None when it cannot be probed."""
+    info = cached(digest)
+    if info is not None:
+        return info
+    try:
+        with conversions.engine_scope(timeout=settings.probe_timeout):
+            info = conversions.probe(src)
+    except conversions.ConversionError:
+        return None  # ffprobe missing or unreadable input: the engine reports it
+    try:
+        get_redis().set(_key(digest), json.dumps(info), ex=settings.result_cache_ttl_hours * 3600)
+    except redis.RedisError:
+        pass
+    return info
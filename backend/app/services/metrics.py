@@ -0,0 +1,132 @@
+"""Prometheus metrics for the API and workers.
+
+Per-stage histograms are labelled by target and storage backend; engine CPU
+time and peak RSS come from wait4() on each engine subprocess (see
+conversions.EngineUsage). Queue depths and result-cache counters are read from
+Redis at scrape time, so they are exact no matter which process serves them.
+
+prometheus_client is optional: without it every call here is a no-op. Set
+PROMETHEUS_MULTIPROC_DIR (a separate, empty directory per service) to
+aggregate across uvicorn workers or Celery prefork children.
+"""
+import os, time
+from contextlib import contextmanager
+import redis
+from ..config import settings
+
+try:
+    import prometheus_client as prom
+    from prometheus_client import multiprocess
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prom = None
+
+_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+_BYTES = tuple(2 ** i * 1024 ** 2 for i in range(3, 14))  # 8 MiB .. 8 GiB
+
+if prom is not None:
+    STAGE_SECONDS = prom.Histogram(
+        "convertbuddy_stage_seconds", "Time spent in each job stage",
+        ["stage", "target", "backend"], buckets=_SECONDS,
+    )
+    ENGINE_CPU = prom.Histogram(
+        "convertbuddy_engine_cpu_seconds", "CPU time of a job's engine subprocesses",
+        ["target"], buckets=_SECONDS,
+    )
+    ENGINE_RSS = prom.Histogram(
+        "convertbuddy_engine_peak_rss_bytes", "Peak RSS of a job's largest engine subprocess",
+        ["target"], buckets=_BYTES,
+    )
+    JOBS = prom.Counter("convertbuddy_jobs_total", "Finished conversion jobs", ["target", "status"])
+
+def enabled() -> bool:
+    return prom is not None
+
+def _multiproc() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def observe(stage: str, seconds: float, target: str = "") -> None:
+    if prom is not None:
+        STAGE_SECONDS.labels(stage, target, settings.storage_backend).observe(seconds)
+
+@contextmanager
+def timed(stage: str, target: str = ""):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, target)
+
+def job_finished(target: str, status: str, usage=None) -> None:
+    if prom is None:
+        return
+    JOBS.labels(target, status).inc()
+    if usage is not None and usage.runs:
+        ENGINE_CPU.labels(target).observe(usage.cpu_s)
+        ENGINE_RSS.labels(target).observe(usage.peak_rss_kb * 1024)
+
+class _RedisCollector:
+    """Scrape-time gauges: broker queue depths and result-cache stats."""
+    def collect(self):
+        from ..workers.celery_app import celery
+        from . import result_cache
+        from .redis_client import get_redis
+        try:
+            names = [q.name for q in celery.conf.task_queues]
+            pipe = get_redis().pipeline(transaction=False)
+            for name in names:
+                pipe.llen(name)
+            depths = pipe.execute()
+            cache = result_cache.stats()
+        except redis.RedisError:
+            return
+        depth = GaugeMetricFamily("convertbuddy_queue_depth", "Messages waiting per broker queue", labels=["queue"])
+        for name, n in zip(names, depths):
+            depth.add_metric([name], n)
+        yield depth
+        yield CounterMetricFamily("convertbuddy_cache_hits", "Result cache hits", value=cache["hits"])
+        yield CounterMetricFamily("convertbuddy_cache_misses", "Result cache misses", value=cache["misses"])
+        yield GaugeMetricFamily("convertbuddy_cache_hit_ratio", "Result cache hit ratio", value=cache["hit_ratio"])
+        yield GaugeMetricFamily("convertbuddy_cache_entries", "Result cache entries", value=cache["entries"])
+        yield GaugeMetricFamily("convertbuddy_cache_bytes", "Result cache size in bytes", value=cache["bytes"])
+
+_api_registry = None
+
+def render() -> tuple[bytes, str]:
+    """Exposition for the API's /metrics (process or multiprocess metrics + Redis gauges)."""
+    global _api_registry
+    if _multiproc():
+        # The multiprocess collector reads every worker's files at collect time
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_RedisCollector())
+    else:
+        if _api_registry is None:
+            prom.REGISTRY.register(_RedisCollector())
+            _api_registry = prom.REGISTRY
+        registry = _api_registry
+    return prom.generate_latest(registry), prom.CONTENT_TYPE_LATEST
+
+def start_worker_exporter(port: int) -> None:
+    """HTTP exporter in the Celery main process; prefork children need multiprocess mode."""
+    if prom is None or port <= 0:
+        return
+    registry = prom.REGISTRY
+    if _multiproc():
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    prom.start_http_server(port, registry=registry)
+
+def clear_multiproc_dir() -> None:
+    """Drop metric files left by a previous run (call before any child starts)."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if prom is None or not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+def mark_process_dead(pid: int) -> None:
+    if prom is not None and _multiproc():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,72 @@
+"""UNO bridge for a long-lived headless LibreOffice instance.
+
+Runs under the interpreter that ships the ``uno`` module (``settings.office_python``,
+usually the distro's /usr/bin/python3), *not* the app interpreter, so it must not
+import anything from the app. Protocol: one JSON request per line on stdin, one
+JSON response per line on stdout.
+
+    {"cmd": "ping"}                                   -> {"ok": true}
+    {"cmd": "convert", "src": ..., "dst": ..., "filter": "writer_pdf_Export"}
+                                                      -> {"ok": true} | {"ok": false, "error": ...}
+"""
+import json
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def _prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+def _connect(pipe_name, timeout):
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    url = f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ctx = resolver.resolve(url)
+            return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def _convert(desktop, src, dst, filter_name):
+    doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(src), "_blank", 0, (_prop("Hidden", True),))
+    if doc is None:
+        raise RuntimeError(f"LibreOffice could not open {src}")
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(dst), (_prop("FilterName", filter_name),))
+    finally:
+        doc.close(True)
+
+
+def _reply(obj):
+    sys.stdout.write(json.dumps(obj) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    pipe_name, timeout = sys.argv[1], float(sys.argv[2])
+    desktop = _connect(pipe_name, timeout)
+    _reply({"ok": True, "ready": True})
+    for line in sys.stdin:
+        try:
+            req = json.loads(line)
+            if req.get("cmd") == "convert":
+                _convert(desktop, req["src"], req["dst"], req.get("filter", "writer_pdf_Export"))
+            _reply({"ok": True})
+        except Exception as e:
+            _reply({"ok": False, "error": str(e)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Per-process pool of warm headless LibreOffice instances.
+
+Each instance owns a private user profile and listens on a named UNO pipe; a
+small bridge process (office_bridge.py, run under the interpreter that has
+``uno``) drives conversions over that pipe. Instances are started lazily,
+health-checked before use, and recycled after ``office_max_conversions``
+conversions, a crash or a timed-out conversion.
+"""
+import atexit, json, os, queue, select, shutil, signal, subprocess, sys, threading
+from pathlib import Path
+from ..config import settings
+
+BRIDGE = Path(__file__).with_name("office_bridge.py")
+
+class OfficeUnavailable(Exception):
+    """The pool cannot serve this conversion; callers fall back to a cold soffice run."""
+
+class OfficeTimeout(Exception):
+    pass
+
+def _kill(proc: subprocess.Popen | None):
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+    proc.wait()
+
+class OfficeInstance:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.pipe_name = f"convertbuddy-{os.getpid()}-{slot}"
+        self.profile = Path(settings.office_profile_root) / self.pipe_name
+        self.soffice: subprocess.Popen | None = None
+        self.bridge: subprocess.Popen | None = None
+        self.conversions = 0
+
+    def start(self):
+        self.stop()
+        self.profile.mkdir(parents=True, exist_ok=True)
+        self.soffice = subprocess.Popen([
+            "soffice", "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+            f"-env:UserInstallation={self.profile.as_uri()}",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        self.bridge = subprocess.Popen(
+            [settings.office_python, str(BRIDGE), self.pipe_name, str(settings.office_start_timeout)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.conversions = 0
+        try:
+            ready = self._read(settings.office_start_timeout + 5)
+        except (OfficeTimeout, OfficeUnavailable):
+            self.stop()
+            raise OfficeUnavailable("LibreOffice instance did not come up")
+        if not ready.get("ok"):
+            self.stop()
+            raise OfficeUnavailable(ready.get("error", "LibreOffice bridge failed"))
+
+    def stop(self):
+        _kill(self.bridge)
+        _kill(self.soffice)
+        self.bridge = self.soffice = None
+
+    def alive(self) -> bool:
+        return (
+            self.soffice is not None and self.soffice.poll() is None
+            and self.bridge is not None and self.bridge.poll() is None
+        )
+
+    def _read(self, timeout: float) -> dict:
+        assert self.bridge and self.bridge.stdout
+        ready, _, _ = select.select([self.bridge.stdout], [], [], timeout)
+        if not ready:
+            raise OfficeTimeout(f"LibreOffice did not answer within {timeout:.0f}s")
+        line = self.bridge.stdout.readline()
+        if not line:
+            raise OfficeUnavailable("LibreOffice bridge exited")
+        return json.loads(line)
+
+    def request(self, payload: dict, timeout: float) -> dict:
+        assert self.bridge and self.bridge.stdin
+        try:
+            self.bridge.stdin.write((json.dumps(payload) + "\n").encode())
+            self.bridge.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise OfficeUnavailable("LibreOffice bridge exited")
+        return self._read(timeout)
+
+    def healthy(self) -> bool:
+        if not self.alive():
+            return False
+        try:
+            return bool(self.request({"cmd": "ping"}, 5).get("ok"))
+        except (OfficeTimeout, OfficeUnavailable, ValueError):
+            return False
+
+    def convert(self, src: Path, dst: Path, filter_name: str, timeout: float) -> dict:
+        resp = self.request({"cmd": "convert", "src": str(src.resolve()), "dst": str(dst.resolve()), "filter": filter_name}, timeout)
+        self.conversions += 1
+        return resp
+
+class OfficePool:
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: queue.Queue[OfficeInstance] = queue.Queue()
+        self._all = [OfficeInstance(i) for i in range(size)]
+        for inst in self._all:
+            self._idle.put(inst)
+
+    def convert(self, src: Path, dst: Path, filter_name: str = "writer_pdf_Export", timeout: float | None = None):
+        timeout = timeout or settings.office_timeout
+        try:
+            inst = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise OfficeUnavailable("No LibreOffice instance free")
+        from .conversions import ConversionError, active_engines
+        try:
+            if inst.conversions >= settings.office_max_conversions or not inst.healthy():
+                inst.start()
+            # A cancelled job's SIGTERM handler kills these along with its other engines
+            with active_engines(inst.soffice.pid, inst.bridge.pid):
+                resp = inst.convert(src, dst, filter_name, timeout)
+        except BaseException:
+            # Hung, crashed, cancelled or interrupted mid-request: a reply may still be
+            # pending on the pipe, so the instance must not serve the next job
+            inst.stop()
+            raise
+        finally:
+            self._idle.put(inst)
+        if not resp.get("ok"):
+            raise ConversionError(resp.get("error") or "LibreOffice conversion failed")
+
+    def close(self):
+        for inst in self._all:
+            inst.stop()
+            shutil.rmtree(inst.profile, ignore_errors=True)
+
+_pool: OfficePool | None = None
+_pool_pid: int | None = None
+_lock = threading.Lock()
+
+def get_office_pool() -> OfficePool | None:
+    """Pool for the current process (created after fork, never inherited)."""
+    global _pool, _pool_pid
+    if settings.office_pool_size <= 0 or sys.platform == "win32":
+        return None
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = OfficePool(settings.office_pool_size)
+            _pool_pid = os.getpid()
+            atexit.register(_pool.close)
+        return _pool
+
+def shutdown_pool():
+    """Stop this process's instances (used when the worker child is being killed)."""
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
@@ -0,0 +1,203 @@
+"""In-process images -> PDF with bounded memory.
+
+JPEGs are embedded byte-for-byte (DCTDecode passthrough, no decode or
+re-encode). Other formats are decoded with Pillow one page at a time and
+stored Flate-compressed. Pages are prepared on a thread pool with a small
+look-ahead window and written to the file in order, so at most a handful of
+images is ever held in memory.
+"""
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+class UnsupportedImage(Exception):
+    """The native engine cannot embed this input; use the ImageMagick path."""
+
+@dataclass
+class EncodedImage:
+    width: int
+    height: int
+    colorspace: str          # DeviceRGB | DeviceGray | DeviceCMYK
+    filter: str              # DCTDecode | FlateDecode
+    data: bytes
+    decode: Optional[str] = None
+
+# SOFn markers carrying frame dimensions (C4 = DHT, C8 = JPG, CC = DAC are not frames)
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_SPACES = {1: "DeviceGray", 3: "DeviceRGB", 4: "DeviceCMYK"}
+
+def _jpeg_info(data: bytes) -> tuple[int, int, int, bool]:
+    """(width, height, components, adobe) from the JPEG header."""
+    if data[:2] != b"\xff\xd8":
+        raise UnsupportedImage("not a JPEG")
+    i, adobe = 2, False
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            raise UnsupportedImage("corrupt JPEG header")
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        seg_len = int.from_bytes(data[i + 2:i + 4], "big")
+        if marker == 0xEE and data[i + 4:i + 9] == b"Adobe":
+            adobe = True
+        if marker in _SOF:
+            if data[i + 4] != 8:
+                # The page is written with /BitsPerComponent 8; 12-bit (and lossless 16-bit) JPEGs go to ImageMagick
+                raise UnsupportedImage(f"{data[i + 4]}-bit JPEG")
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height, data[i + 9], adobe
+        if marker == 0xDA:
+            break
+        i += 2 + seg_len
+    raise UnsupportedImage("no JPEG frame header")
+
+def encode_image(path: Path) -> EncodedImage:
+    with open(path, "rb") as f:
+        head = f.read(2)
+        if head == b"\xff\xd8":
+            data = head + f.read()
+            width, height, comps, adobe = _jpeg_info(data)
+            if comps not in _JPEG_SPACES or not width or not height:
+                raise UnsupportedImage(f"unsupported JPEG ({comps} components)")
+            # Adobe CMYK JPEGs are stored inverted
+            decode = "[1 0 1 0 1 0 1 0]" if comps == 4 and adobe else None
+            return EncodedImage(width, height, _JPEG_SPACES[comps], "DCTDecode", data, decode)
+    try:
+        from PIL import Image
+    except ImportError:
+        raise UnsupportedImage("Pillow is not installed")
+    try:
+        with Image.open(path) as im:
+            if getattr(im, "n_frames", 1) > 1:
+                # Multi-page TIFF, animated GIF/WebP: ImageMagick emits a page per frame
+                raise UnsupportedImage(f"{im.n_frames} frames")
+            if im.mode in ("RGBA", "LA", "P", "PA") or "transparency" in im.info:
+                # Flatten alpha onto white, as a printed page would show it
+                rgba = im.convert("RGBA")
+                bg = Image.new("RGB", rgba.size, (255, 255, 255))
+                bg.paste(rgba, mask=rgba.getchannel("A"))
+                im2 = bg
+            elif im.mode in ("L", "1"):
+                im2 = im.convert("L")
+            elif im.mode == "I" or im.mode.startswith("I;16"):
+                # 16-bit greyscale: scale down to 8 bits, convert("L") alone clips it to white
+                wide = im.convert("I") if im.mode != "I" else im
+                hi = wide.getextrema()[1]
+                if hi > 0xFFFF:
+                    raise UnsupportedImage(f"{im.mode} values up to {hi}")
+                sixteen = im.mode != "I" or hi > 0xFF  # "I" holding 8-bit values stays as is
+                im2 = (wide.point(lambda v: v / 256) if sixteen else wide).convert("L")
+            elif im.mode == "F":
+                raise UnsupportedImage("floating-point image")
+            else:
+                im2 = im.convert("RGB")
+            space = "DeviceGray" if im2.mode == "L" else "DeviceRGB"
+            return EncodedImage(im2.width, im2.height, space, "FlateDecode", zlib.compress(im2.tobytes(), 6))
+    except UnsupportedImage:
+        raise
+    except Exception as e:
+        raise UnsupportedImage(str(e))
+
+class PdfImageWriter:
+    """Streams one image per page into a PDF; objects are written as they come."""
+    def __init__(self, path: Path):
+        self._f = open(path, "wb")
+        self._offsets: dict[int, int] = {}
+        self._pages: list[int] = []
+        self._next = 3  # 1 = catalog, 2 = page tree
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _alloc(self) -> int:
+        n = self._next
+        self._next += 1
+        return n
+
+    def _write_obj(self, num: int, body: bytes, stream: Optional[bytes] = None):
+        self._offsets[num] = self._f.tell()
+        self._f.write(f"{num} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._f.write(b"\nstream\n")
+            self._f.write(stream)
+            self._f.write(b"\nendstream")
+        self._f.write(b"\nendobj\n")
+
+    def add_page(self, img: EncodedImage, dpi: int):
+        w_pt = img.width * 72.0 / dpi
+        h_pt = img.height * 72.0 / dpi
+        img_id, content_id, page_id = self._alloc(), self._alloc(), self._alloc()
+        decode = f" /Decode {img.decode}" if img.decode else ""
+        self._write_obj(img_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {img.width} /Height {img.height}"
+            f" /ColorSpace /{img.colorspace} /BitsPerComponent 8 /Filter /{img.filter}{decode}"
+            f" /Length {len(img.data)} >>"
+        ).encode(), img.data)
+        content = f"q {w_pt:.4f} 0 0 {h_pt:.4f} 0 0 cm /Im0 Do Q".encode()
+        self._write_obj(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._write_obj(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.4f} {h_pt:.4f}]"
+            f" /Resources << /XObject << /Im0 {img_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self._pages.append(page_id)
+
+    def close(self):
+        if not self._pages:
+            self.abort()
+            raise UnsupportedImage("no pages")
+        kids = " ".join(f"{p} 0 R" for p in self._pages)
+        self._write_obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode())
+        self._write_obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._f.tell()
+        self._f.write(f"xref\n0 {self._next}\n0000000000 65535 f \n".encode())
+        for n in range(1, self._next):
+            self._f.write(f"{self._offsets[n]:010d} 00000 n \n".encode())
+        self._f.write(f"trailer\n<< /Size {self._next} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+        self._f.close()
+
+    def abort(self):
+        name = self._f.name
+        self._f.close()
+        Path(name).unlink(missing_ok=True)
+
+def images_to_pdf_native(
+    src_list: list[Path],
+    dst: Path,
+    dpi: int = 300,
+    threads: int = 4,
+    on_progress: Optional[Callable[[float], None]] = None,
+    check: Optional[Callable[[], None]] = None,
+):
+    """Raises UnsupportedImage (after removing ``dst``) if any input cannot be embedded."""
+    if not src_list:
+        raise UnsupportedImage("no images")
+    writer = PdfImageWriter(dst)
+    window = max(threads * 2, 2)  # prepared-but-unwritten pages held in memory
+    pool = ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="pdfwriter")
+    try:
+        it = iter(src_list)
+        pending: deque = deque(pool.submit(encode_image, p) for p in islice(it, window))
+        done = 0
+        while pending:
+            writer.add_page(pending.popleft().result(), dpi)
+            done += 1
+            if check:
+                check()
+            if on_progress:
+                on_progress(done / len(src_list))
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(pool.submit(encode_image, nxt))
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
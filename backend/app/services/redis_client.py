@@ -0,0 +1,7 @@
+from functools import lru_cache
+import redis
+from ..config import settings
+
+@lru_cache(maxsize=1)
+def get_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.redis_url, decode_responses=True)
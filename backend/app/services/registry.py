@@ -0,0 +1,212 @@
+"""Converter registry and planner.
+
+Converters declare one edge of the format graph (src -> dst) with the engine
+that runs it and a relative cost. ``plan(target)`` finds the cheapest path
+(e.g. docx -> pdf -> jpg). Supported targets are every direct edge plus the
+multi-step chains enabled with ``allow_chain``: steps share the job's options
+(``dpi`` means something different to image->pdf and pdf->jpg) and a
+multi-input first step merges uploads, so not every path the graph can connect
+is a sensible conversion. Adding a format or converter is one ``register`` call.
+"""
+import heapq
+from functools import lru_cache
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Optional
+from ..config import settings
+from . import conversions
+from .conversions import ConversionError
+from .pdfwriter import UnsupportedImage, images_to_pdf_native
+
+@dataclass(frozen=True)
+class Format:
+    name: str
+    extensions: tuple[str, ...]
+    mime_prefixes: tuple[str, ...] = ()
+    label: str = ""
+
+    def accepts(self, filename: str, mime: str) -> bool:
+        return filename.lower().endswith(self.extensions) or any(mime.startswith(m) for m in self.mime_prefixes)
+
+@dataclass
+class StepContext:
+    out_dir: Path
+    options: dict
+    progress: Callable[..., None]
+    # Final step only: called with finished outputs in order while the step is still running
+    on_ready: Optional[Callable[[list[Path], int], None]] = None
+    # First step only: ffprobe result for the job's input, if the API already has it
+    media: Optional[dict] = None
+
+@dataclass(frozen=True)
+class Converter:
+    src: str
+    dst: str
+    engine: str                 # "ffmpeg" | "raster" | "office"; picks the worker queue
+    cost: float                 # relative, used by the planner
+    fn: Callable[[list[Path], StepContext], list[Path]] = field(compare=False)
+    multi_input: bool = False   # takes all inputs at once (N images -> 1 PDF)
+    zip_name: str = "output"    # archive name when the step yields several files
+    # Option values the step uses when the job does not set them (also part of the result-cache key)
+    defaults: dict = field(default_factory=dict, compare=False)
+
+    def run(self, inputs: list[Path], ctx: StepContext) -> list[Path]:
+        if self.defaults:
+            ctx = replace(ctx, options={**self.defaults, **ctx.options})
+        if self.multi_input or len(inputs) <= 1:
+            return self.fn(inputs, ctx)
+        outputs: list[Path] = []
+        n = len(inputs)
+        for i, src in enumerate(inputs):
+            sub = StepContext(ctx.out_dir, ctx.options, lambda f, _i=i, **m: ctx.progress((_i + f) / n, **m))
+            outputs += self.fn([src], sub)
+        return outputs
+
+FORMATS: dict[str, Format] = {}
+_EDGES: dict[str, list[Converter]] = {}
+_CHAINS: set[str] = set()
+
+def register_format(fmt: Format) -> None:
+    FORMATS[fmt.name] = fmt
+
+def register(conv: Converter) -> None:
+    # one converter per edge; re-registering replaces it
+    _EDGES[conv.src] = [c for c in _EDGES.get(conv.src, []) if c.dst != conv.dst] + [conv]
+    supported_targets.cache_clear()
+
+def allow_chain(target: str) -> None:
+    """Offer a multi-step target (e.g. "docx->jpg") to clients."""
+    _CHAINS.add(target)
+    supported_targets.cache_clear()
+
+def plan(target: str) -> list[Converter]:
+    """Cheapest chain of converters for "src->dst" (Dijkstra over the format graph)."""
+    src, _, dst = target.partition("->")
+    if src not in FORMATS or dst not in FORMATS:
+        raise ValueError(f"Unknown target: {target}")
+    heap: list[tuple[float, int, str, list[Converter]]] = [(0.0, 0, src, [])]
+    seen: set[str] = set()
+    tie = 0
+    while heap:
+        cost, _, fmt, path = heapq.heappop(heap)
+        if fmt == dst and path:
+            return path
+        if fmt in seen:
+            continue
+        seen.add(fmt)
+        for conv in _EDGES.get(fmt, []):
+            if conv.dst not in seen:
+                tie += 1
+                heapq.heappush(heap, (cost + conv.cost, tie, conv.dst, path + [conv]))
+    raise ValueError(f"No conversion path for {target}")
+
+@lru_cache(maxsize=1)
+def supported_targets() -> frozenset[str]:
+    out = set()
+    for src in FORMATS:
+        for dst in FORMATS:
+            if src == dst:
+                continue
+            target = f"{src}->{dst}"
+            try:
+                steps = plan(target)
+            except ValueError:
+                continue
+            if len(steps) == 1 or target in _CHAINS:
+                out.add(target)
+    return frozenset(out)
+
+def default_options(target: str) -> dict:
+    """Options every step of ``target`` falls back to, merged in step order."""
+    out: dict = {}
+    try:
+        for step in plan(target):
+            out.update(step.defaults)
+    except ValueError:
+        pass
+    return out
+
+def source_format(target: str) -> Format:
+    return FORMATS[target.partition("->")[0]]
+
+def engine_for(target: str) -> Optional[str]:
+    """Engine of the most expensive step; that is where the job spends its time."""
+    try:
+        return max(plan(target), key=lambda c: c.cost).engine
+    except ValueError:
+        return None
+
+def accepts_many(target: str) -> bool:
+    """Whether several uploads merge into one output (first step is multi-input)."""
+    try:
+        return plan(target)[0].multi_input
+    except ValueError:
+        return False
+
+# -------- Built-in formats --------
+
+IMAGE_FORMATS = ("jpg", "png", "webp", "tiff")
+
+for _fmt in (
+    Format("mp4", (".mp4", ".m4v", ".mov", ".mkv", ".webm"), ("video/",), "a video file"),
+    Format("mp3", (".mp3",), ("audio/mpeg",), "an MP3 file"),
+    Format("pdf", (".pdf",), ("application/pdf",), "a PDF"),
+    # jpg accepts any image: the ImageMagick/native engines read them all
+    Format("jpg", (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff"), ("image/",), "an image"),
+    Format("png", (".png",), ("image/png",), "a PNG image"),
+    Format("webp", (".webp",), ("image/webp",), "a WebP image"),
+    Format("tiff", (".tif", ".tiff"), ("image/tiff",), "a TIFF image"),
+    Format("docx", (".docx",), (), "a .docx file"),
+):
+    register_format(_fmt)
+
+# -------- Built-in converters --------
+
+def _mp4_to_mp3(inputs: list[Path], ctx: StepContext) -> list[Path]:
+    out = ctx.out_dir / "output.mp3"
+    conversions.mp4_to_mp3(inputs[0], out, bitrate=ctx.options.get("bitrate"), on_progress=ctx.progress, media=ctx.media)
+    return [out]
+
+def _pdf_to_jpg(inputs: list[Path], ctx: StepContext) -> list[Path]:
+    def on_pages(done: int, total: int):
+        ctx.progress(done / max(total, 1), pages_done=done, pages_total=total)
+    return conversions.pdf_to_jpg_parallel(
+        inputs[0], ctx.out_dir / "images", dpi=int(ctx.options["dpi"]),
+        workers=settings.pdf_raster_concurrency,
+        chunk_pages=settings.pdf_raster_chunk_pages,
+        on_progress=on_pages,
+        on_ready=ctx.on_ready,
+    )
+
+def _images_to_pdf(inputs: list[Path], ctx: StepContext) -> list[Path]:
+    if not inputs:
+        raise ConversionError("No input files provided")
+    out = ctx.out_dir / "output.pdf"
+    dpi = int(ctx.options["dpi"])
+    if settings.image_pdf_engine == "native":
+        try:
+            images_to_pdf_native(inputs, out, dpi=dpi, threads=settings.image_pdf_threads,
+                                 on_progress=ctx.progress, check=conversions.check_scope)
+            return [out]
+        except UnsupportedImage:
+            pass  # e.g. Pillow missing or an exotic format; ImageMagick reads everything
+    if len(inputs) > 1:
+        conversions.images_to_pdf(inputs, out, dpi=dpi, on_progress=ctx.progress)
+    else:
+        conversions.jpg_to_pdf(inputs[0], out, dpi=dpi, on_progress=ctx.progress)
+    return [out]
+
+def _docx_to_pdf(inputs: list[Path], ctx: StepContext) -> list[Path]:
+    src = inputs[0]
+    conversions.docx_to_pdf(src, ctx.out_dir)
+    out = ctx.out_dir / f"{src.stem}.pdf"
+    if not out.is_file():
+        raise ConversionError("No PDF produced by LibreOffice")
+    return [out]
+
+register(Converter("mp4", "mp3", "ffmpeg", 3.0, _mp4_to_mp3))
+register(Converter("pdf", "jpg", "raster", 2.0, _pdf_to_jpg, zip_name="pages", defaults={"dpi": 200}))
+for _img in IMAGE_FORMATS:
+    register(Converter(_img, "pdf", "raster", 1.0, _images_to_pdf, multi_input=True, defaults={"dpi": 300}))
+register(Converter("docx", "pdf", "office", 4.0, _docx_to_pdf, zip_name="docs"))
+allow_chain("docx->jpg")
@@ -0,0 +1,124 @@
+"""Content-addressed cache of finished conversions.
+
+Entries are keyed on sha256(input bytes) + target + normalized options. The
+artifact itself lives in the storage backend under the cache prefix; Redis
+keeps the index (entry hash + LRU sorted set), the byte total and hit/miss
+counters. All Redis failures degrade to a cache miss.
+"""
+import hashlib, json, time
+from pathlib import Path
+import redis
+from ..config import settings
+from .redis_client import get_redis
+from . import storage, registry
+
+_NS = "convertbuddy:cache"
+_LRU = f"{_NS}:lru"
+_BYTES = f"{_NS}:bytes"
+_HITS = f"{_NS}:hits"
+_MISSES = f"{_NS}:misses"
+_CLAIM_SECONDS = 3600
+
+def _entry(key: str) -> str:
+    return f"{_NS}:entry:{key}"
+
+def _claim(key: str) -> str:
+    return f"{_NS}:claim:{key}"
+
+def cache_key(input_digest: str, target: str, options: dict | None) -> str:
+    # Defaults filled in, so {} and {"dpi": 200} for pdf->jpg share an entry
+    opts = {**registry.default_options(target), **(options or {})}
+    norm = json.dumps(opts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{input_digest}\0{target}\0{norm}".encode()).hexdigest()
+
+def lookup(key: str) -> Path | None:
+    if not settings.result_cache_enabled:
+        return None
+    r = get_redis()
+    try:
+        path = r.hget(_entry(key), "path")
+        if path and storage.exists(path):
+            pipe = r.pipeline()
+            pipe.zadd(_LRU, {key: time.time()})
+            pipe.incr(_HITS)
+            pipe.execute()
+            return Path(path)
+        if path:
+            # Index points at an artifact that is gone; forget it
+            _drop(r, key)
+        r.incr(_MISSES)
+    except redis.RedisError:
+        pass
+    return None
+
+def store(key: str, output: Path) -> None:
+    if not settings.result_cache_enabled:
+        return
+    r = get_redis()
+    # Claim the entry before copying: of two workers finishing the same input only
+    # one stores (and counts) the artifact. The claim outlives the store so a
+    # worker that checked for the entry just before it appeared still loses.
+    if r.exists(_entry(key)) or not r.set(_claim(key), 1, nx=True, ex=_CLAIM_SECONDS):
+        return
+    try:
+        cached, size = storage.store_in_cache(key, output)
+        pipe = r.pipeline()
+        pipe.hset(_entry(key), mapping={"path": str(cached), "size": size, "created": int(time.time())})
+        pipe.zadd(_LRU, {key: time.time()})
+        pipe.incrby(_BYTES, size)
+        pipe.execute()
+    except BaseException:
+        r.delete(_claim(key))
+        raise
+    evict_to_size()
+
+def _drop(r: redis.Redis, key: str) -> int:
+    entry = r.hgetall(_entry(key))
+    size = int(entry.get("size", 0) or 0)
+    if entry.get("path"):
+        try:
+            storage.delete(entry["path"])
+        except Exception:
+            pass
+    pipe = r.pipeline()
+    pipe.delete(_entry(key))
+    pipe.zrem(_LRU, key)
+    if entry:
+        pipe.decrby(_BYTES, size)
+    pipe.execute()
+    return size
+
+def evict_to_size() -> int:
+    """Drop least-recently-used entries until the cache fits result_cache_max_bytes."""
+    r = get_redis()
+    evicted = 0
+    while int(r.get(_BYTES) or 0) > settings.result_cache_max_bytes:
+        oldest = r.zrange(_LRU, 0, 0)
+        if not oldest:
+            r.set(_BYTES, 0)
+            break
+        _drop(r, oldest[0])
+        evicted += 1
+    return evicted
+
+def evict_expired() -> int:
+    """Drop entries not hit within result_cache_ttl_hours (called from cleanup_expired)."""
+    r = get_redis()
+    cutoff = time.time() - settings.result_cache_ttl_hours * 3600
+    evicted = 0
+    for key in r.zrangebyscore(_LRU, "-inf", cutoff):
+        _drop(r, key)
+        evicted += 1
+    return evicted
+
+def stats() -> dict:
+    r = get_redis()
+    hits, misses, size = r.mget(_HITS, _MISSES, _BYTES)
+    hits, misses = int(hits or 0), int(misses or 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "entries": r.zcard(_LRU),
+        "bytes": int(size or 0),
+    }
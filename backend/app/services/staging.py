@@ -0,0 +1,122 @@
+"""Worker-local staging for remote (S3) storage.
+
+Engines need real files. Inputs are downloaded once into a bounded scratch
+cache (shared by all worker processes on the host, LRU by last use), so retries
+and repeat conversions of the same key skip the download. Each job renders into
+its own work dir, and outputs are uploaded back to the job prefix.
+
+A job pins the inputs it staged by hard-linking them into its work dir and
+reads them from there: eviction skips entries with more than one link, and a
+cached copy evicted anyway (racing another process) stays readable through the
+job's link. ``release(job_id)`` drops the work dir and with it the pins.
+"""
+import hashlib, os, shutil, time, uuid
+from pathlib import Path
+from ..config import settings
+
+_STALE_CHECK_SECONDS = 600
+
+class StagingCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.inputs = Path(root) / "inputs"
+        self.work = Path(root) / "work"
+        self.max_bytes = max_bytes
+        self._stale_checked = 0.0
+
+    def _path_for(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return self.inputs / digest[:2] / f"{digest}{Path(key).suffix.lower()}"
+
+    def fetch(self, backend, key: str, job_id: str | None = None) -> Path:
+        """Local copy of ``key``; with ``job_id`` the copy is pinned until ``release(job_id)``."""
+        dst = self._path_for(key)
+        grew = False
+        for _ in range(3):
+            if dst.is_file():
+                os.utime(dst)  # mark as recently used
+            else:
+                self._download(backend, key, dst)
+                grew = True
+            if job_id is None:
+                break
+            pin = self.work_dir(job_id) / ".inputs" / dst.name
+            pin.parent.mkdir(exist_ok=True)
+            try:
+                os.link(dst, pin)
+            except FileExistsError:
+                pass
+            except FileNotFoundError:
+                continue  # evicted between the check and the link; fetch again
+            dst = pin
+            break
+        else:
+            raise FileNotFoundError(f"Could not stage {key}")
+        if grew:  # hits add no bytes; only a download can push the cache over its cap
+            self.evict()
+        return dst
+
+    def _download(self, backend, key: str, dst: Path):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.part")
+        try:
+            backend.download_file(key, tmp)
+            os.replace(tmp, dst)  # atomic: concurrent fetches of one key are harmless
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def evict(self) -> int:
+        """Drop least-recently-used unpinned inputs until the cache fits max_bytes."""
+        if time.monotonic() - self._stale_checked > _STALE_CHECK_SECONDS:
+            self._stale_checked = time.monotonic()
+            self._drop_stale_work()
+        entries = []
+        total = 0
+        for p in self.inputs.glob("*/*"):
+            if p.name.startswith("."):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            if st.st_nlink == 1:  # no job holds a link to it
+                entries.append((st.st_mtime, st.st_size, p))
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def _drop_stale_work(self):
+        # Work dirs left by killed workers would pin their inputs forever; no task
+        # outlives its time limit, so anything this old is dead
+        cutoff = time.time() - settings.engine_timeout - 3600
+        try:
+            dirs = list(os.scandir(self.work))
+        except FileNotFoundError:
+            return
+        for d in dirs:
+            try:
+                if d.is_dir() and d.stat().st_mtime < cutoff:
+                    shutil.rmtree(d.path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+    def work_dir(self, job_id: str) -> Path:
+        p = self.work / job_id
+        p.mkdir(parents=True, exist_ok=True)
+        return p
+
+    def release(self, job_id: str) -> None:
+        shutil.rmtree(self.work / job_id, ignore_errors=True)
+
+_cache: StagingCache | None = None
+
+def get_staging() -> StagingCache:
+    global _cache
+    if _cache is None:
+        _cache = StagingCache(settings.staging_dir, settings.staging_max_bytes)
+    return _cache
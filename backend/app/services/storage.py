@@ -1,56 +1,127 @@
-import zipfile
+import os, threading
 from pathlib import Path
-from typing import Iterable, List
-from .storage_backend import get_storage_backend
+from typing import Iterable, List, Optional
+from .storage_backend import StorageBackend, get_storage_backend
+from .zipstream import ZipStreamWriter
 from ..config import settings
 
-_backend = get_storage_backend()
+# Built on first use, once per process: a boto3 client must never cross a fork
+_backend: StorageBackend | None = None
+_backend_pid = 0
+_backend_lock = threading.Lock()
+
+def get_backend() -> StorageBackend:
+    global _backend, _backend_pid
+    if _backend is None or _backend_pid != os.getpid():
+        with _backend_lock:
+            if _backend is None or _backend_pid != os.getpid():
+                _backend = get_storage_backend()
+                _backend_pid = os.getpid()
+    return _backend
+
+def reset_backend() -> None:
+    global _backend
+    _backend = None
 
 def job_dir(job_id: str) -> Path:
-    p = _backend.job_dir(job_id)
+    p = get_backend().job_dir(job_id)
     return Path(p) if isinstance(p, str) else p
 
 def save_upload(job_id: str, file) -> Path:
-    key = _backend.save_file(job_id, f"input_{file.filename}", file.file)
+    key = get_backend().save_file(job_id, f"input_{file.filename}", file.file)
     return Path(key)
 
 def save_uploads(job_id: str, files) -> list[Path]:
     tuples = [(f.filename, f.file) for f in files]
-    keys = _backend.save_files(job_id, tuples)
+    keys = get_backend().save_files(job_id, tuples)
     return [Path(k) for k in keys]
 
+def open_writer(job_id: str, filename: str):
+    return get_backend().open_writer(job_id, filename)
+
+def _remote() -> bool:
+    return settings.storage_backend == 's3'
+
+def work_dir(job_id: str) -> Path:
+    """Local directory engines write into (the job dir itself unless storage is remote)."""
+    if _remote():
+        from .staging import get_staging
+        return get_staging().work_dir(job_id)
+    return job_dir(job_id)
+
+def scratch_dir(job_id: str, name: str) -> Path:
+    """Worker-local dir for intermediates that must never reach storage."""
+    from .staging import get_staging
+    p = get_staging().work_dir(job_id) / name
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+def release_work_dir(job_id: str) -> None:
+    """Drop the job's worker-local scratch (for remote storage, also its work dir)."""
+    from .staging import get_staging
+    get_staging().release(job_id)
+
+def stage_input(key: str, job_id: Optional[str] = None) -> Path:
+    """Local path for a stored input; remote objects go through the staging cache
+    (pinned for ``job_id`` until ``release_work_dir``)."""
+    if _remote():
+        from .staging import get_staging
+        return get_staging().fetch(get_backend(), key, job_id)
+    return Path(key)
+
+def publish_output(job_id: str, path: Path) -> Path:
+    """Make a locally produced output durable; returns its storage key."""
+    if _remote() and Path(path).is_absolute() and Path(path).is_file():
+        key = get_backend().path_for(job_id, Path(path).name)
+        get_backend().upload_file(Path(path), key)
+        return Path(key)
+    return Path(path)
+
 def make_output_path(job_id: str, ext: str, name: str = "output") -> Path:
-    if settings.storage_backend == 's3':
-        # just return file name; backend uses job prefix internally
-        return Path(f"{name}.{ext.lstrip('.')}")
-    return Path(job_dir(job_id) / f"{name}.{ext.lstrip('.')}")
+    return work_dir(job_id) / f"{name}.{ext.lstrip('.')}"
 
 def presign_download(path: Path) -> str:
     key = str(path)
     fname = Path(key).name
-    return _backend.presign_download(key, force_download_name=fname)
+    return get_backend().presign_download(key, force_download_name=fname)
+
+def exists(path: Path | str) -> bool:
+    return get_backend().exists(str(path))
+
+def delete(path: Path | str) -> None:
+    get_backend().delete(str(path))
+
+def is_stored_key(key: str) -> bool:
+    """True if ``key`` names an object this app stored (guards client-supplied keys)."""
+    if settings.storage_backend == 's3':
+        return key.startswith("jobs/") and ".." not in key and get_backend().exists(key)
+    base = Path(settings.storage_dir).resolve()
+    p = Path(key).resolve()
+    return p.is_relative_to(base) and p.is_file()
 
-def package_single_or_zip(job_id: str, files: list[Path], zip_name: str = "output") -> Path:
+def store_in_cache(digest: str, path: Path) -> tuple[Path, int]:
+    """Copy a finished output into the content-addressed cache area."""
+    dst = get_backend().cache_path(digest, Path(str(path)).name)
+    get_backend().copy(str(path), dst)
+    return Path(dst), get_backend().size(dst)
+
+def open_zip(job_id: str, zip_name: str = "output") -> ZipStreamWriter:
+    """Streaming archive in the job's storage; members can be added as they are produced."""
+    sink, key = get_backend().open_sink(job_id, f"{zip_name}.zip")
+    return ZipStreamWriter(sink, key)
+
+def package_single_or_zip(job_id: str, files: list[Path], zip_name: str = "output", arcnames: list[str] | None = None) -> Path:
+    """A single output as is, several as one archive."""
+    return package_outputs(job_id, files, zip_name, arcnames)[0]
+
+def package_outputs(job_id: str, files: list[Path], zip_name: str = "output", arcnames: list[str] | None = None) -> tuple[Path, Optional[int], Optional[str]]:
+    """``package_single_or_zip`` plus the archive's size and SHA-256 (hashed while written; None for a single file)."""
     if not files:
         raise RuntimeError("No output files produced")
     if len(files) == 1:
-        return files[0]
-    if settings.storage_backend == 's3':
-        import io
-        from .storage_backend import get_storage_backend
-        be = get_storage_backend()
-        key = f"jobs/{job_id}/{zip_name}.zip"
-        buf = io.BytesIO()
-        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
-            for p in files:
-                z.write(str(p), arcname=Path(str(p)).name)
-        buf.seek(0)
-        be.client.upload_fileobj(buf, be.bucket, key)  # type: ignore
-        return Path(key)
-    else:
-        jd = job_dir(job_id)
-        zip_path = jd / f"{zip_name}.zip"
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for f in files:
-                z.write(f, arcname=Path(f).name)
-        return zip_path
+        return files[0], None, None
+    names = arcnames or [Path(str(p)).name for p in files]
+    with open_zip(job_id, zip_name) as zw:
+        for f, name in zip(files, names):
+            zw.add(f, name)
+    return Path(zw.key), zw.size, zw.sha256
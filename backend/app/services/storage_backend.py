@@ -3,20 +3,23 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Iterable, List, Protocol, runtime_checkable
+import asyncio
 import uuid
 import mimetypes
+import logging
 import os
 
 from ..config import settings
 
-try:
-    import boto3
-    from botocore.config import Config as BotoConfig
-except Exception:
-    boto3 = None
+log = logging.getLogger(__name__)
 
 from typing import Any
 
+# Top-level prefix/dir holding the result cache; never treated as a job dir
+CACHE_PREFIX = "cache"
+# Per-job record of stored inputs/outputs (see services/manifest.py)
+MANIFEST_NAME = "manifest.json"
+
 @runtime_checkable
 class StorageBackend(Protocol):
     def job_dir(self, job_id: str) -> str: ...
@@ -25,17 +28,59 @@ class StorageBackend(Protocol):
     def path_for(self, job_id: str, filename: str) -> str: ...
     def presign_download(self, key: str, force_download_name: str | None = None, expires_in: int = 3600) -> str: ...
     def delete_older_than(self, before: datetime) -> int: ...
+    def delete_jobs(self, job_ids: list[str]) -> tuple[int, int]: ...
+    def cache_path(self, digest: str, filename: str) -> str: ...
+    def exists(self, key: str) -> bool: ...
+    def size(self, key: str) -> int: ...
+    def copy(self, src_key: str, dst_key: str) -> None: ...
+    def delete(self, key: str) -> None: ...
+    def open_writer(self, job_id: str, filename: str) -> "AsyncWriter": ...
+    def open_sink(self, job_id: str, filename: str) -> tuple[Any, str]: ...
+    # Upload sessions; ``ref`` is the backend's handle (S3 UploadId, local parts dir)
+    def init_upload(self, job_id: str, filename: str, content_type: str | None = None) -> tuple[str, str]: ...
+    def list_parts(self, key: str, ref: str) -> list[dict]: ...
+    def complete_upload(self, key: str, ref: str, on_chunk=None) -> str | None: ...
+    def abort_upload(self, key: str, ref: str) -> None: ...
+    def read_head(self, key: str, n: int) -> bytes: ...
+    # Small whole-object reads/writes (manifests); read_bytes returns None if missing
+    def read_bytes(self, key: str) -> bytes | None: ...
+    def write_bytes(self, key: str, data: bytes) -> None: ...
+
+class AsyncWriter(Protocol):
+    async def write(self, chunk: bytes) -> None: ...
+    async def close(self) -> str: ...
+    async def abort(self) -> None: ...
 
 # -------- Local filesystem backend --------
 
 class LocalBackend(StorageBackend):
+    """Job dirs are sharded as ``ab/cd/<job_id>`` so no directory grows past a few
+    thousand entries; dirs from the older flat ``<job_id>`` layout are still
+    found for download and cleanup."""
     base: Path
+    _MADE_MAX = 4096
+
     def __init__(self, base: Path):
         self.base = Path(base)
+        self.base.mkdir(parents=True, exist_ok=True)
+        self._made: set[str] = set()  # job dirs this process already created
+
+    def _job_path(self, job_id: str) -> Path:
+        return self.base / job_id[:2] / job_id[2:4] / job_id
+
+    def _job_paths(self, job_id: str) -> list[Path]:
+        """Existing dirs of a job: sharded and/or legacy flat."""
+        if not job_id or '/' in job_id or job_id in ('.', '..', CACHE_PREFIX) or len(job_id) <= 2:
+            return []
+        return [p for p in (self._job_path(job_id), self.base / job_id) if p.is_dir()]
 
     def job_dir(self, job_id: str) -> str:
-        p = self.base / job_id
-        p.mkdir(parents=True, exist_ok=True)
+        p = self._job_path(job_id)
+        if job_id not in self._made:
+            p.mkdir(parents=True, exist_ok=True)
+            if len(self._made) >= self._MADE_MAX:
+                self._made.clear()
+            self._made.add(job_id)
         return str(p)
 
     def save_file(self, job_id: str, filename: str, data_stream) -> str:
@@ -67,15 +112,116 @@ class LocalBackend(StorageBackend):
         rel = str(Path(key).absolute()).replace(str(self.base.absolute()) + os.sep, '').replace('\\', '/')
         return f"/files/{rel}"
 
+    def cache_path(self, digest: str, filename: str) -> str:
+        p = self.base / CACHE_PREFIX / digest[:2] / digest
+        p.mkdir(parents=True, exist_ok=True)
+        return str(p / filename)
+
+    def exists(self, key: str) -> bool:
+        return Path(key).is_file()
+
+    def size(self, key: str) -> int:
+        return Path(key).stat().st_size
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        # Hard link when possible: the cache entry then outlives the job dir for free
+        try:
+            os.link(src_key, dst_key)
+        except OSError:
+            import shutil
+            shutil.copyfile(src_key, dst_key)
+
+    def delete(self, key: str) -> None:
+        p = Path(key)
+        p.unlink(missing_ok=True)
+        try:
+            p.parent.rmdir()
+            self._made.discard(p.parent.name)
+        except OSError:
+            pass
+
+    def open_writer(self, job_id: str, filename: str) -> "LocalAsyncWriter":
+        safe = filename.replace('/', '_').replace('..', '.')
+        return LocalAsyncWriter(Path(self.job_dir(job_id)) / safe)
+
+    def open_sink(self, job_id: str, filename: str) -> tuple[Any, str]:
+        p = Path(self.job_dir(job_id)) / filename
+        return open(p, 'wb'), str(p)
+
+    def init_upload(self, job_id: str, filename: str, content_type: str | None = None) -> tuple[str, str]:
+        key = self.path_for(job_id, filename)
+        parts = Path(key).with_name(f".parts-{Path(key).name}")
+        parts.mkdir(parents=True, exist_ok=True)
+        return key, str(parts)
+
+    @staticmethod
+    def part_path(ref: str, part: int) -> Path:
+        return Path(ref) / f"{part:05d}"
+
+    def list_parts(self, key: str, ref: str) -> list[dict]:
+        return [{"part": int(p.name), "size": p.stat().st_size} for p in sorted(Path(ref).glob("[0-9]*"))]
+
+    def complete_upload(self, key: str, ref: str, on_chunk=None) -> str | None:
+        """Concatenate the parts into ``key``; ``on_chunk`` sees every byte once (hashing)."""
+        import shutil
+        dst = Path(key)
+        tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp, 'wb') as out:
+                for p in sorted(Path(ref).glob("[0-9]*")):
+                    with open(p, 'rb') as f:
+                        while chunk := f.read(settings.upload_chunk_bytes):
+                            out.write(chunk)
+                            if on_chunk:
+                                on_chunk(chunk)
+            os.replace(tmp, dst)
+        finally:
+            tmp.unlink(missing_ok=True)
+        shutil.rmtree(ref, ignore_errors=True)
+        return None
+
+    def abort_upload(self, key: str, ref: str) -> None:
+        import shutil
+        shutil.rmtree(ref, ignore_errors=True)
+
+    def read_head(self, key: str, n: int) -> bytes:
+        with open(key, 'rb') as f:
+            return f.read(n)
+
+    def read_bytes(self, key: str) -> bytes | None:
+        try:
+            return Path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        # Written aside and renamed: readers never see a torn file
+        p = Path(key)
+        tmp = p.with_name(f".{p.name}.{uuid.uuid4().hex}")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, p)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _job_dirs(self):
+        """Every job dir: ``ab/cd/<job_id>`` shards plus legacy flat dirs."""
+        for top in os.scandir(self.base):
+            if not top.is_dir(follow_symlinks=False) or top.name == CACHE_PREFIX:
+                continue
+            if len(top.name) != 2:
+                yield Path(top.path)  # legacy flat layout
+                continue
+            for mid in os.scandir(top.path):
+                if mid.is_dir(follow_symlinks=False):
+                    yield from (Path(e.path) for e in os.scandir(mid.path) if e.is_dir(follow_symlinks=False))
+
     def delete_older_than(self, before: datetime) -> int:
         count = 0
-        base = self.base
-        if not base.exists():
+        if not self.base.exists():
             return 0
-        for job_dir in base.iterdir():
+        for job_dir in self._job_dirs():
             try:
-                if not job_dir.is_dir():
-                    continue
                 mtime = datetime.fromtimestamp(job_dir.stat().st_mtime, tz=timezone.utc)
                 if mtime < before:
                     import shutil
@@ -85,13 +231,162 @@ class LocalBackend(StorageBackend):
                 pass
         return count
 
+    @staticmethod
+    def _remove_tree(p: Path) -> int:
+        """rmtree that reports the bytes it freed (0 if the dir is already gone).
+
+        Sizes come from the job's manifest when it has one; only jobs without
+        one (older jobs, bare upload sessions) are walked and stat'ed.
+        """
+        from .manifest import stored_bytes
+        freed = stored_bytes(p / MANIFEST_NAME)
+        if freed is None:
+            freed = 0
+            for root, _, names in os.walk(p):
+                for n in names:
+                    try:
+                        freed += os.lstat(os.path.join(root, n)).st_size
+                    except OSError:
+                        pass
+        import shutil
+        shutil.rmtree(p, ignore_errors=True)
+        return freed
+
+    def delete_jobs(self, job_ids: list[str]) -> tuple[int, int]:
+        # rmtree is syscall-bound; a small thread pool overlaps the metadata I/O
+        from concurrent.futures import ThreadPoolExecutor
+        dirs = [d for j in job_ids for d in self._job_paths(j)]
+        with ThreadPoolExecutor(max_workers=settings.cleanup_concurrency) as pool:
+            freed = sum(pool.map(self._remove_tree, dirs))
+        self._made.difference_update(job_ids)
+        return len({d.name for d in dirs}), freed
+
+class LocalAsyncWriter:
+    """Streams chunks to a local file through aiofiles (writes run off the event loop)."""
+    def __init__(self, path: Path):
+        self.path = path
+        self._f = None
+
+    async def write(self, chunk: bytes) -> None:
+        if self._f is None:
+            import aiofiles
+            self._f = await aiofiles.open(self.path, 'wb')
+        await self._f.write(chunk)
+
+    async def close(self) -> str:
+        if self._f is None:
+            await self.write(b"")
+        await self._f.close()
+        return str(self.path)
+
+    async def abort(self) -> None:
+        if self._f is not None:
+            await self._f.close()
+        await asyncio.to_thread(self.path.unlink, missing_ok=True)
+
 # -------- S3/MinIO backend --------
 
+class S3MultipartWriter:
+    """File-like sink that uploads to S3 in fixed-size multipart parts.
+
+    Only one part is buffered at a time, so memory stays at ~part_size no matter
+    how much is written. Objects smaller than one part go up with a single PUT.
+    """
+    def __init__(self, client, bucket: str, key: str, part_size: int | None = None, content_type: str | None = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size or settings.s3_part_bytes, 5 * 1024 * 1024)
+        self.content_type = content_type
+        self._buf = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[dict] = []
+        self.closed = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        while len(self._buf) >= self.part_size:
+            self._flush_part(bytes(self._buf[:self.part_size]))
+            del self._buf[:self.part_size]
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def _flush_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            extra = {"ContentType": self.content_type} if self.content_type else {}
+            self._upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, **extra)["UploadId"]
+        n = len(self._parts) + 1
+        resp = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=n, Body=body)
+        self._parts.append({"PartNumber": n, "ETag": resp["ETag"]})
+
+    def close(self) -> str:
+        if self.closed:
+            return self.key
+        if self._upload_id is None:
+            extra = {"ContentType": self.content_type} if self.content_type else {}
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buf), **extra)
+        else:
+            if self._buf:
+                self._flush_part(bytes(self._buf))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buf = bytearray()
+        self.closed = True
+        return self.key
+
+    def abort(self) -> None:
+        if self._upload_id is not None and not self.closed:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._buf = bytearray()
+        self.closed = True
+
+class S3AsyncWriter:
+    """Async facade over S3MultipartWriter; part uploads run in a worker thread."""
+    def __init__(self, writer: S3MultipartWriter):
+        self._w = writer
+
+    async def write(self, chunk: bytes) -> None:
+        if len(self._w._buf) + len(chunk) < self._w.part_size:
+            self._w.write(chunk)   # pure buffer append, no I/O
+        else:
+            await asyncio.to_thread(self._w.write, chunk)
+
+    async def close(self) -> str:
+        return await asyncio.to_thread(self._w.close)
+
+    async def abort(self) -> None:
+        await asyncio.to_thread(self._w.abort)
+
 class S3Backend(StorageBackend):
     def __init__(self, bucket: str, endpoint_url: str | None, region: str | None, access_key: str, secret_key: str, force_path_style: bool = True):
-        if boto3 is None:
+        # Imported here: boto3 costs ~0.3s at startup and the local backend never needs it
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config as BotoConfig
+        except ImportError:
             raise RuntimeError("boto3 is required for S3 backend")
-        cfg = BotoConfig(s3={"addressing_style": "path" if force_path_style else "virtual"})
+        cfg = BotoConfig(
+            s3={"addressing_style": "path" if force_path_style else "virtual"},
+            # One client per process, shared by every thread; the pool must cover
+            # parallel part transfers of concurrent jobs.
+            max_pool_connections=settings.s3_max_pool_connections,
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            tcp_keepalive=True,
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=settings.s3_part_bytes,
+            multipart_chunksize=settings.s3_part_bytes,
+            max_concurrency=settings.s3_transfer_concurrency,
+            use_threads=True,
+        )
         self.client = boto3.client(
             's3',
             endpoint_url=endpoint_url,
@@ -143,18 +438,146 @@ class S3Backend(StorageBackend):
         url = self.client.generate_presigned_url('getObject', Params=params, ExpiresIn=expires_in)
         return url
 
+    def cache_path(self, digest: str, filename: str) -> str:
+        return f"{CACHE_PREFIX}/{digest[:2]}/{digest}/{filename}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def size(self, key: str) -> int:
+        return int(self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"])
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        # Server-side copy; managed copy switches to multipart above 5 GB
+        self.client.copy({"Bucket": self.bucket, "Key": src_key}, self.bucket, dst_key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def open_writer(self, job_id: str, filename: str) -> S3AsyncWriter:
+        key = self._job_prefix(job_id) + filename
+        ctype, _ = mimetypes.guess_type(filename)
+        return S3AsyncWriter(S3MultipartWriter(self.client, self.bucket, key, content_type=ctype))
+
+    def download_file(self, key: str, dst: Path) -> None:
+        # Parallel ranged GETs above the multipart threshold
+        self.client.download_file(self.bucket, key, str(dst), Config=self.transfer)
+
+    def upload_file(self, src: Path, key: str) -> None:
+        ctype, _ = mimetypes.guess_type(str(src))
+        extra = {"ContentType": ctype} if ctype else None
+        self.client.upload_file(str(src), self.bucket, key, ExtraArgs=extra, Config=self.transfer)
+
+    def open_sink(self, job_id: str, filename: str) -> tuple[S3MultipartWriter, str]:
+        key = self._job_prefix(job_id) + filename
+        ctype, _ = mimetypes.guess_type(filename)
+        return S3MultipartWriter(self.client, self.bucket, key, content_type=ctype), key
+
+    def init_upload(self, job_id: str, filename: str, content_type: str | None = None) -> tuple[str, str]:
+        key = self._job_prefix(job_id) + filename
+        ctype = content_type or mimetypes.guess_type(filename)[0]
+        extra = {"ContentType": ctype} if ctype else {}
+        return key, self.client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)["UploadId"]
+
+    def presign_part(self, key: str, ref: str, part: int, expires_in: int = 3600) -> str:
+        # The client PUTs the part straight to the bucket; the API never sees the bytes
+        return self.client.generate_presigned_url(
+            'upload_part',
+            Params={"Bucket": self.bucket, "Key": key, "UploadId": ref, "PartNumber": part},
+            ExpiresIn=expires_in,
+        )
+
+    def list_parts(self, key: str, ref: str) -> list[dict]:
+        paginator = self.client.get_paginator('list_parts')
+        return [
+            {"part": p["PartNumber"], "size": p["Size"], "etag": p["ETag"]}
+            for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=ref)
+            for p in page.get('Parts', []) or []
+        ]
+
+    def complete_upload(self, key: str, ref: str, on_chunk=None) -> str | None:
+        # ETags come from S3's own record, so clients need not read them from CORS responses
+        parts = [{"PartNumber": p["part"], "ETag": p["etag"]} for p in self.list_parts(key, ref)]
+        resp = self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=ref, MultipartUpload={"Parts": parts},
+        )
+        return resp.get("ETag", "").strip('"') or None
+
+    def abort_upload(self, key: str, ref: str) -> None:
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=ref)
+        except self.client.exceptions.NoSuchUpload:
+            pass
+
+    def read_head(self, key: str, n: int) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{n - 1}")["Body"].read()
+
+    def read_bytes(self, key: str) -> bytes | None:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def write_bytes(self, key: str, data: bytes) -> None:
+        ctype, _ = mimetypes.guess_type(key)
+        extra = {"ContentType": ctype} if ctype else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def _delete_keys(self, keys: list[str]) -> set[str]:
+        """Delete ``keys``; returns those S3 still refused after one retry (logged, not counted)."""
+        failed: set[str] = set()
+        # DeleteObjects takes at most 1000 keys per request
+        for i in range(0, len(keys), 1000):
+            batch = keys[i:i + 1000]
+            for _ in range(2):
+                resp = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+                )
+                errors = resp.get("Errors", []) or []
+                batch = [e["Key"] for e in errors]
+                if not batch:
+                    break
+            else:
+                failed.update(batch)
+                log.warning("S3 refused to delete %d keys, e.g. %s: %s", len(batch), batch[0], errors[0].get("Code"))
+        return failed
+
     def delete_older_than(self, before: datetime) -> int:
         paginator = self.client.get_paginator('list_objects_v2')
-        deleted = 0
+        doomed: list[str] = []
         for page in paginator.paginate(Bucket=self.bucket, Prefix="jobs/"):
             for obj in page.get('Contents', []) or []:
                 last = obj.get('LastModified')
                 if last:
                     last = last if last.tzinfo else last.replace(tzinfo=timezone.utc)
                     if last < before:
-                        self.client.delete_object(Bucket=self.bucket, Key=obj['Key'])
-                        deleted += 1
-        return deleted
+                        doomed.append(obj['Key'])
+        return len(doomed) - len(self._delete_keys(doomed))
+
+    def _list_job(self, job_id: str) -> list[tuple[str, int]]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        return [
+            (obj['Key'], obj.get('Size', 0))
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self._job_prefix(job_id))
+            for obj in page.get('Contents', []) or []
+        ]
+
+    def delete_jobs(self, job_ids: list[str]) -> tuple[int, int]:
+        if not job_ids:
+            return 0, 0
+        from concurrent.futures import ThreadPoolExecutor
+        # One listing per job (ids share no prefix); run them concurrently over the client's pool
+        with ThreadPoolExecutor(max_workers=min(settings.cleanup_concurrency, len(job_ids))) as pool:
+            listings = list(pool.map(self._list_job, job_ids))
+        failed = self._delete_keys([key for objs in listings for key, _ in objs])
+        jobs = sum(1 for objs in listings if objs and not any(key in failed for key, _ in objs))
+        freed = sum(size for objs in listings for key, size in objs if key not in failed)
+        return jobs, freed
 
 def get_storage_backend() -> StorageBackend:
     if settings.storage_backend.lower() == 'local':
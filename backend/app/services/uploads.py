@@ -0,0 +1,173 @@
+"""Resumable upload sessions.
+
+initiate -> upload parts (any order, in parallel, retried individually) ->
+complete. The part layout is fixed at initiate from the declared size. On S3
+each part is PUT straight to the bucket with a presigned upload_part URL and
+completion is a CompleteMultipartUpload; locally parts are written under the
+upload's dir and concatenated on completion. Session state lives in a Redis
+hash; the finished object sits in ``jobs/<upload_id>/`` and expires like a job.
+"""
+import hashlib, math, time, uuid
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+from ..config import settings
+from .redis_client import get_redis
+from .storage import get_backend
+from .ingest import SNIFF_BYTES, PageCounter, sniff_mime
+from . import expiry, manifest
+from ..utils.files import safe_filename
+
+MAX_PARTS = 10000   # S3's limit, applied everywhere so both backends share one layout
+MIN_PART = 5 * 1024 * 1024
+
+class UploadError(Exception):
+    pass
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    size: int
+    part_size: int
+    parts: int
+    key: str
+    ref: str
+    status: str = "open"
+    created: float = 0.0
+    mime: str = ""
+    sha256: str = ""
+    pages: int = -1   # -1: unknown
+
+    @property
+    def direct(self) -> bool:
+        return settings.storage_backend == "s3"
+
+    def part_bytes(self, part: int) -> int:
+        """Exact size part ``part`` must have."""
+        return self.part_size if part < self.parts else self.size - self.part_size * (self.parts - 1)
+
+def _key(upload_id: str) -> str:
+    return f"convertbuddy:upload:{upload_id}"
+
+def _ttl() -> int:
+    # Outlive the stored object so cleanup can still abort an open multipart upload
+    return settings.expiry_hours * 3600 + 86400
+
+def _save(s: UploadSession) -> None:
+    pipe = get_redis().pipeline()
+    pipe.hset(_key(s.upload_id), mapping={k: str(v) for k, v in asdict(s).items()})
+    pipe.expire(_key(s.upload_id), _ttl())
+    pipe.execute()
+
+def load(upload_id: str) -> Optional[UploadSession]:
+    raw = get_redis().hgetall(_key(upload_id))
+    if not raw:
+        return None
+    types = {f.name: f.type for f in fields(UploadSession)}
+    return UploadSession(**{k: types[k](v) for k, v in raw.items() if k in types})
+
+def create(filename: str, size: int, content_type: Optional[str] = None) -> UploadSession:
+    if size > settings.max_upload_bytes:
+        raise UploadError(f"Upload exceeds {settings.max_upload_bytes} bytes")
+    part_size = max(settings.upload_part_bytes, MIN_PART, math.ceil(size / MAX_PARTS))
+    upload_id = str(uuid.uuid4())
+    key, ref = get_backend().init_upload(upload_id, f"input_{safe_filename(filename)}", content_type)
+    session = UploadSession(
+        upload_id=upload_id, filename=filename, size=size, part_size=part_size,
+        parts=max(math.ceil(size / part_size), 1), key=key, ref=ref, created=time.time(),
+    )
+    _save(session)
+    expiry.track(upload_id)
+    return session
+
+def received(session: UploadSession) -> list[dict]:
+    if session.status == "complete":
+        return [{"part": n} for n in range(1, session.parts + 1)]
+    return get_backend().list_parts(session.key, session.ref)
+
+def part_urls(session: UploadSession, parts: list[int]) -> dict[int, str]:
+    """Where the client sends each part: presigned S3 URLs, or this API's part endpoint."""
+    bad = [n for n in parts if not 1 <= n <= session.parts]
+    if bad:
+        raise UploadError(f"Part numbers must be between 1 and {session.parts}")
+    if session.direct:
+        be = get_backend()
+        return {n: be.presign_part(session.key, session.ref, n) for n in parts}
+    return {n: f"/uploads/{session.upload_id}/parts/{n}" for n in parts}
+
+def complete(session: UploadSession) -> UploadSession:
+    """Assemble the parts; idempotent once complete."""
+    if session.status == "complete":
+        return session
+    r = get_redis()
+    if not r.set(f"{_key(session.upload_id)}:completing", 1, nx=True, ex=600):
+        raise UploadError("Upload is already being completed")
+    try:
+        return _complete(session)
+    finally:
+        r.delete(f"{_key(session.upload_id)}:completing")
+
+def _complete(session: UploadSession) -> UploadSession:
+    be = get_backend()
+    have = {p["part"]: p["size"] for p in be.list_parts(session.key, session.ref)}
+    missing = [n for n in range(1, session.parts + 1) if n not in have]
+    if missing:
+        raise UploadError(f"Missing parts: {missing[:20]}")
+    wrong = [n for n in range(1, session.parts + 1) if have[n] != session.part_bytes(n)]
+    if wrong:
+        raise UploadError(f"Parts with the wrong size: {wrong[:20]}")
+
+    # Local assembly reads every byte once: sniff, hash and count pages on the way
+    h = hashlib.sha256()
+    pages: Optional[PageCounter] = None
+
+    def on_chunk(chunk: bytes):
+        nonlocal pages
+        if not session.mime:
+            session.mime = sniff_mime(chunk)
+            pages = PageCounter() if session.mime == "application/pdf" else None
+        h.update(chunk)
+        if pages is not None:
+            pages.feed(chunk)
+
+    etag = be.complete_upload(session.key, session.ref, on_chunk=on_chunk)
+    if etag is None:
+        session.sha256 = h.hexdigest()
+        session.pages = pages.finish() if pages is not None else -1
+        stored = manifest.entry(session.key, session.size, session.sha256, mime=session.mime)
+    else:
+        # Bytes went straight to S3, so there is no content hash; the multipart
+        # ETag (MD5 of part MD5s) identifies the content for the result cache
+        session.mime = sniff_mime(be.read_head(session.key, SNIFF_BYTES))
+        session.sha256 = hashlib.sha256(f"s3-etag:{etag}:{session.size}".encode()).hexdigest()
+        stored = manifest.entry(session.key, session.size, None, mime=session.mime, etag=etag)
+    manifest.record(session.upload_id, "inputs", [stored])
+    session.status = "complete"
+    _save(session)
+    return session
+
+def abort(session: UploadSession) -> None:
+    be = get_backend()
+    if session.status == "open":
+        be.abort_upload(session.key, session.ref)
+    else:
+        be.delete(session.key)
+    get_redis().delete(_key(session.upload_id))
+
+def purge(upload_ids: list[str]) -> int:
+    """Cleanup hook: abort sessions among expired ids (open S3 multipart uploads are invisible to listing)."""
+    if not upload_ids:
+        return 0
+    pipe = get_redis().pipeline(transaction=False)
+    for i in upload_ids:
+        pipe.exists(_key(i))
+    n = 0
+    for upload_id, present in zip(upload_ids, pipe.execute()):
+        if not present:
+            continue
+        session = load(upload_id)
+        if session is not None and session.status == "open":
+            get_backend().abort_upload(session.key, session.ref)
+        get_redis().delete(_key(upload_id))
+        n += 1
+    return n
@@ -0,0 +1,82 @@
+"""Constant-memory zip packaging.
+
+Members are copied into the archive in small blocks and the archive bytes go
+straight to a sink: a local file, or an S3MultipartWriter that ships each part
+as soon as it fills. Already-compressed formats are stored, not deflated.
+The archive is written strictly sequentially (data descriptors, no header
+rewrites), so its size and SHA-256 are known at close without reading it back.
+"""
+import hashlib, zipfile
+from pathlib import Path
+
+# Formats whose payload is already entropy-coded; deflate costs CPU for ~0% gain
+STORED_EXTS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".mp4", ".mov", ".mkv", ".webm",
+    ".zip", ".gz", ".bz2", ".xz", ".7z", ".docx", ".xlsx", ".pptx",
+}
+
+def compress_type_for(name: str) -> int:
+    return zipfile.ZIP_STORED if Path(name).suffix.lower() in STORED_EXTS else zipfile.ZIP_DEFLATED
+
+class _HashingSink:
+    """Write-only view of a sink that hashes what passes through.
+
+    No tell()/seek(), so zipfile treats it as unseekable and never rewrites.
+    """
+    def __init__(self, sink):
+        self._sink = sink
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.hash.update(data)
+        self.size += len(data)
+        self._sink.write(data)
+        return len(data)
+
+    def flush(self):
+        self._sink.flush()
+
+class ZipStreamWriter:
+    def __init__(self, sink, key: str):
+        self.key = key
+        self._sink = sink
+        self._out = _HashingSink(sink)
+        self._zip = zipfile.ZipFile(self._out, "w", allowZip64=True)
+        self.count = 0
+        self.size = 0
+        self.sha256: str | None = None  # set by close()
+
+    def add(self, path: Path | str, arcname: str | None = None):
+        name = arcname or Path(str(path)).name
+        self._zip.write(str(path), arcname=name, compress_type=compress_type_for(name))
+        self.count += 1
+
+    def close(self) -> str:
+        self._zip.close()
+        self._sink.close()
+        self.size, self.sha256 = self._out.size, self._out.hash.hexdigest()
+        return self.key
+
+    def abort(self):
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        if hasattr(self._sink, "abort"):
+            self._sink.abort()
+        else:
+            self._sink.close()
+            Path(self.key).unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -1,16 +1,99 @@
 from celery import Celery
+import os
+from celery.signals import celeryd_init, worker_init, worker_process_shutdown
+from kombu import Queue
 from ..config import settings
 
 celery = Celery(
     "convertbuddy",
     broker=settings.redis_url,
     backend=settings.redis_url,
+    include=["backend.app.workers.tasks", "backend.app.workers.cleanup"],
 )
 
-# Periodic cleanup schedule (hourly)
+# Periodic cleanup schedule: indexed expiry hourly, full storage sweep daily
 celery.conf.beat_schedule = {
     "cleanup-expired-hourly": {
         "task": "backend.app.workers.cleanup.cleanup_expired",
         "schedule": 3600.0,
-    }
+    },
+    "sweep-unindexed-daily": {
+        "task": "backend.app.workers.cleanup.sweep_unindexed",
+        "schedule": 86400.0,
+    },
 }
+
+# -------- Engine-aware routing --------
+# convert_task goes to "<engine>.<lane>"; everything else (cleanup, chord
+# callbacks) stays on the default "celery" queue.
+
+CONVERT_TASK = "backend.app.workers.tasks.convert_task"
+PACKAGE_TASK = "backend.app.workers.tasks.package_batch"
+DEFAULT_QUEUE = "celery"
+LANES = ("fast", "slow")
+
+# Per-engine worker tuning, applied by configure_worker() from the -Q list.
+# Long conversions prefetch nothing extra and ack late so a lost worker's job is redelivered.
+ENGINE_WORKER = {
+    "ffmpeg": {"concurrency": settings.ffmpeg_concurrency, "prefetch": 1, "acks_late": True},
+    "raster": {"concurrency": settings.raster_concurrency, "prefetch": 1, "acks_late": True},
+    "office": {"concurrency": settings.office_concurrency, "prefetch": 1, "acks_late": True},
+}
+
+def queue_for(engine: str, input_size: int | None = None, page_count: int | None = None, duration: float | None = None) -> str:
+    slow = (
+        (input_size or 0) > settings.slow_lane_bytes
+        or (page_count or 0) > settings.slow_lane_pages
+        or (duration or 0) > settings.slow_lane_seconds
+    )
+    return f"{engine}.{'slow' if slow else 'fast'}"
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    if name != CONVERT_TASK:
+        return None
+    from ..services.registry import engine_for
+    engine = engine_for((kwargs or {}).get("target") or "")
+    if engine is None:
+        return None
+    return {"queue": queue_for(engine, kwargs.get("input_size"), kwargs.get("page_count"), kwargs.get("duration"))}
+
+celery.conf.task_queues = [Queue(DEFAULT_QUEUE)] + [Queue(f"{e}.{lane}") for e in ENGINE_WORKER for lane in LANES]
+celery.conf.task_default_queue = DEFAULT_QUEUE
+celery.conf.task_routes = (route_task,)
+
+# Hard limit of convert_task. Engine queues ack late, and Redis redelivers an
+# unacked message after visibility_timeout, so that must outlast the longest
+# task (plus a prefetched message's wait) or long jobs would run twice.
+CONVERT_TIME_LIMIT = settings.engine_timeout + 300
+celery.conf.broker_transport_options = {"visibility_timeout": max(3600, 2 * CONVERT_TIME_LIMIT)}
+
+@celeryd_init.connect
+def configure_worker(sender=None, conf=None, options=None, **kwargs):
+    """Tune prefetch/acks/concurrency for the engines this worker consumes (-Q)."""
+    queues = (options or {}).get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    engines = {q.split(".", 1)[0] for q in queues} & set(ENGINE_WORKER)
+    if not engines:
+        return
+    cfgs = [ENGINE_WORKER[e] for e in engines]
+    conf.worker_prefetch_multiplier = min(c["prefetch"] for c in cfgs)
+    conf.task_acks_late = any(c["acks_late"] for c in cfgs)
+    conf.task_reject_on_worker_lost = conf.task_acks_late
+    # ``options`` is a copy here; the worker reads conf.worker_concurrency when -c is not given
+    if not (options or {}).get("concurrency"):
+        # 0 means one child per CPU; resolve it first so it does not lose to a small fixed value
+        conf.worker_concurrency = max(c["concurrency"] or os.cpu_count() or 1 for c in cfgs)
+
+# -------- Metrics --------
+
+@worker_init.connect
+def start_metrics_exporter(**_):
+    from ..services import metrics
+    metrics.clear_multiproc_dir()  # before the pool forks
+    metrics.start_worker_exporter(settings.worker_metrics_port)
+
+@worker_process_shutdown.connect
+def retire_metrics(pid=None, **_):
+    from ..services import metrics
+    metrics.mark_process_dead(pid or os.getpid())
@@ -1,11 +1,47 @@
+import time
 from datetime import datetime, timedelta, timezone
 from .celery_app import celery
 from ..config import settings
-from ..services.storage_backend import get_storage_backend
+from ..services.storage import get_backend
+from ..services import result_cache, expiry, admission, uploads
 
 @celery.task
 def cleanup_expired():
+    started = time.monotonic()
     cutoff = datetime.now(tz=timezone.utc) - timedelta(hours=settings.expiry_hours)
-    be = get_storage_backend()
-    deleted = be.delete_older_than(cutoff)
-    return {"deleted": deleted, "before": cutoff.isoformat()}
+    be = get_backend()
+    deleted = freed = 0
+    # Pull only expired ids from the index, in bounded rounds
+    while True:
+        job_ids = expiry.due(cutoff.timestamp())
+        if not job_ids:
+            break
+        uploads.purge(job_ids)  # abort unfinished multipart uploads first; listing cannot see them
+        n, b = be.delete_jobs(job_ids)
+        deleted += n
+        freed += b
+        expiry.forget(job_ids)
+        admission.dequeued(*job_ids)  # jobs whose message was lost never cleared their entry
+    cache_evicted = result_cache.evict_expired() + result_cache.evict_to_size()
+    return {
+        "deleted": deleted,
+        "bytes_freed": freed,
+        "cache_evicted": cache_evicted,
+        "duration_s": round(time.monotonic() - started, 3),
+        "before": cutoff.isoformat(),
+    }
+
+@celery.task
+def sweep_unindexed():
+    """Daily full scan for anything the expiry index never saw.
+
+    cleanup_expired only knows ids that were tracked: jobs from before the
+    index existed, jobs whose track() call failed and everything lost with a
+    flushed Redis are invisible to it, so without this sweep their files would
+    stay forever. It only takes keys ``sweep_grace_hours`` past the expiry, so it
+    never races the indexed cleanup for jobs the index does know.
+    """
+    started = time.monotonic()
+    cutoff = datetime.now(tz=timezone.utc) - timedelta(hours=settings.expiry_hours + settings.sweep_grace_hours)
+    deleted = get_backend().delete_older_than(cutoff)
+    return {"deleted": deleted, "duration_s": round(time.monotonic() - started, 3), "before": cutoff.isoformat()}
@@ -1,54 +1,302 @@
-import os, shutil
+import os, shutil, signal, threading, time
+from contextlib import contextmanager
 from pathlib import Path
-from .celery_app import celery
-from ..services.storage import job_dir, make_output_path, presign_download, package_single_or_zip
-from ..services import conversions
+from celery.exceptions import Ignore
+from celery.signals import worker_process_init
+from .celery_app import celery, CONVERT_TIME_LIMIT
+from ..config import settings
+from ..services import storage
+from ..services.storage import (
+    work_dir, scratch_dir, release_work_dir, stage_input, publish_output,
+    presign_download, package_outputs, open_zip,
+)
+from ..services import conversions, result_cache, events, registry, metrics, admission, manifest, jobstore
+from ..services.cancel import is_cancelled
+from ..services.media import describe as describe_media
+from ..services.office_pool import shutdown_pool
 
-@celery.task(bind=True)
-def convert_task(self, job_id: str, target: str, input_path: str | None = None, options: dict | None = None, multi_inputs: list[str] | None = None):
+# Job this child is converting while a cancel may still be enforced by SIGTERM
+# ("armed" once the handler below is installed, i.e. in prefork children), and
+# the job a watchdog SIGTERM was sent for
+_running: dict = {"job_id": None, "armed": False, "term_for": None}
+
+@worker_process_init.connect
+def _reap_engines_on_term(**_):
+    # revoke(terminate=True) and the cancel watchdog SIGTERM this child; engines run
+    # in their own process groups, so take them down first instead of orphaning them.
+    def on_term(signum, frame):
+        job_id, term_for = _running["job_id"], _running["term_for"]
+        _running["term_for"] = None
+        if term_for is not None and term_for != job_id:
+            return  # the watchdog's signal arrived after its job had finished
+        if job_id is not None and (term_for == job_id or is_cancelled(job_id)):
+            # A cancelled job that did not stop by itself: unwind through
+            # convert_task's cancel path so its work dir and zip are cleaned up.
+            conversions.kill_active()
+            _running["job_id"] = None
+            raise conversions.ConversionCancelled("Job cancelled")
+        conversions.kill_active()
+        shutdown_pool()
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+    signal.signal(signal.SIGTERM, on_term)
+    _running["armed"] = True
+
+@worker_process_init.connect
+def _init_backend(**_):
+    # Each prefork child builds its own storage client (boto3 clients and their
+    # connection pools are not fork-safe) before the first task, not during it.
+    storage.reset_backend()
+    storage.get_backend()
+
+@contextmanager
+def _cancellable(job_id: str):
+    """Cancels are cooperative (engines poll the flag); one still running
+    ``cancel_grace_seconds`` after the flag was set is SIGTERMed by a watchdog."""
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(1.0):
+            if is_cancelled(job_id):
+                if not done.wait(settings.cancel_grace_seconds) and _running["armed"] and _running["job_id"] == job_id:
+                    _running["term_for"] = job_id
+                    os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    _running["job_id"], _running["term_for"] = job_id, None
+    threading.Thread(target=watch, name=f"cancel-watch-{job_id}", daemon=True).start()
+    try:
+        yield
+    finally:
+        done.set()
+        _running["job_id"] = None
+
+class Progress:
+    """Maps engine progress (0..1) onto the job's 5..95% band, throttled.
+
+    Every update is stored as task state and published as a job event.
+    """
+    def __init__(self, task, job_id: str, start: int = 5, end: int = 95):
+        self.task, self.job_id, self.start, self.end = task, job_id, start, end
+        self.last_pct = start
+        self.last_at = 0.0
+
+    def __call__(self, fraction: float, **meta):
+        pct = self.start + int((self.end - self.start) * max(0.0, min(fraction, 1.0)))
+        now = time.monotonic()
+        if pct <= self.last_pct or (now - self.last_at < settings.progress_interval and pct < self.end):
+            return
+        self.last_pct, self.last_at = pct, now
+        self.report(pct, **meta)
+
+    def report(self, pct: int, **meta):
+        self.task.update_state(state="STARTED", meta={"progress": pct, **meta})
+        jobstore.report(self.job_id, status="processing", progress=pct)
+        events.publish(self.job_id, "processing", pct)
+
+@celery.task(bind=True, time_limit=CONVERT_TIME_LIMIT)
+def convert_task(self, job_id: str, target: str, input_path: str | None = None, options: dict | None = None, multi_inputs: list[str] | None = None, cache_key: str | None = None, batch_id: str | None = None, input_size: int | None = None, page_count: int | None = None, enqueued_at: float | None = None, duration: float | None = None, media: dict | None = None, input_sha256: str | None = None):
+    # input_size/page_count/duration are measured at upload and only used for queue routing
     options = options or {}
-    jd = job_dir(job_id)
-    src = Path(input_path) if input_path else None
+    progress = Progress(self, job_id)
+    started_at, cpu_start = time.time(), time.process_time()
+    queue_wait = max(started_at - enqueued_at, 0.0) if enqueued_at else None
+    if queue_wait is not None:
+        metrics.observe("queue_wait", queue_wait, target)
+    admission.dequeued(job_id)
+    scope = None
     try:
-        self.update_state(state="STARTED", meta={"progress": 5})
-
-        if target == "mp4->mp3" and src:
-            out = make_output_path(job_id, "mp3")
-            bitrate = options.get("bitrate", "192k")
-            conversions.mp4_to_mp3(src, out, bitrate=bitrate)
-            final_path = out
-
-        elif target == "pdf->jpg" and src:
-            out_dir = jd / "images"
-            dpi = int(options.get("dpi", 200))
-            conversions.pdf_to_jpg(src, out_dir, dpi=dpi)
-            imgs = sorted(out_dir.glob("page-*.jpg")) or sorted(out_dir.glob("page*.jpg")) or list(out_dir.glob("*.jpg"))
-            final_path = package_single_or_zip(job_id, imgs, zip_name="pages")
-
-        elif target == "jpg->pdf":
-            dpi = int(options.get("dpi", 300))
-            out = make_output_path(job_id, "pdf")
-            if multi_inputs and len(multi_inputs) > 0:
-                paths = [Path(p) for p in multi_inputs]
-                conversions.images_to_pdf(paths, out, dpi=dpi)
-            elif src:
-                conversions.jpg_to_pdf(src, out, dpi=dpi)
-            else:
-                raise RuntimeError("No input files provided for jpg->pdf")
-            final_path = out
-
-        elif target == "docx->pdf" and src:
-            conversions.docx_to_pdf(src, jd)
-            pdfs = list(jd.glob("*.pdf"))
-            if not pdfs:
-                raise RuntimeError("No PDF produced by LibreOffice")
-            final_path = package_single_or_zip(job_id, pdfs, zip_name="docs")
+        if is_cancelled(job_id):
+            # Cancelled while queued, and delivered anyway (revoke only reaches live workers)
+            raise conversions.ConversionCancelled("Job cancelled")
+        jobstore.start(job_id, started_at)
+        progress.report(5)
+        jd = work_dir(job_id)
+        with _cancellable(job_id):
+            with metrics.timed("stage_input", target):
+                src = stage_input(input_path, job_id) if input_path else None
+                staged = [str(stage_input(p, job_id)) for p in multi_inputs] if multi_inputs else None
+            if media is None and input_sha256 and src is not None:
+                # New media input: probe the staged copy once and cache it for re-uploads
+                with metrics.timed("probe", target):
+                    media = describe_media(input_sha256, src)
+            with conversions.engine_scope(should_cancel=lambda: is_cancelled(job_id)) as scope:
+                # Batch members always produce the archive the batch is built from
+                archive = bool(options.get("zip", True)) or batch_id is not None
+                local_path, outputs, pub = _convert(job_id, target, jd, src, options, staged, progress, media, archive)
+        if pub.zw is not None:
+            output_bytes = pub.zw.size
+        else:
+            output_bytes = sum(p.stat().st_size for p in ([local_path] if local_path else outputs))
+        final_path = download_url = None
+        if local_path is not None:
+            with metrics.timed("publish", target):
+                final_path = publish_output(job_id, local_path)
+                manifest.record(job_id, "outputs", [_deliverable_entry(local_path, final_path, pub.zw)])
+            with metrics.timed("presign", target):
+                download_url = presign_download(final_path)
+        if cache_key and final_path is not None:
+            try:
+                with metrics.timed("cache_store", target):
+                    result_cache.store(cache_key, final_path)
+            except Exception:
+                # A cache failure must never fail an otherwise good conversion
+                pass
+        jobstore.report(job_id, status="done", progress=100, finished=time.time(), output=final_path and str(final_path), output_bytes=output_bytes)
+        events.publish(job_id, "done", 100, download_url=download_url)
+        metrics.job_finished(target, "done", scope.usage)
+        stats = {
+            "started_at": started_at,
+            "queue_wait_s": round(queue_wait, 3) if queue_wait is not None else None,
+            "wall_s": round(time.time() - started_at, 3),
+            "cpu_s": round(time.process_time() - cpu_start, 3),
+            "output_bytes": output_bytes,
+            "outputs": len(outputs),
+            "first_output_s": round(pub.first_at - started_at, 3) if pub.first_at else None,
+            **scope.usage.as_dict(),
+        }
+        return {"progress": 100, "download_url": download_url, "output": final_path and str(final_path), "stats": stats}
 
+    except conversions.ConversionCancelled:
+        jobstore.report(job_id, status="cancelled", error="Job cancelled", finished=time.time())
+        events.publish(job_id, "cancelled", progress.last_pct, error="Job cancelled")
+        metrics.job_finished(target, "cancelled", scope and scope.usage)
+        if batch_id:
+            return {"progress": 100, "error": "Job cancelled"}
+        self.backend.mark_as_revoked(self.request.id, reason="Job cancelled", request=self.request)
+        raise Ignore()
+    except Exception as e:
+        jobstore.report(job_id, status="error", error=str(e) or type(e).__name__, finished=time.time())
+        events.publish(job_id, "error", progress.last_pct, error=str(e) or type(e).__name__)
+        metrics.job_finished(target, "error", scope and scope.usage)
+        # A failed header task would stop the whole chord; batch members report
+        # the error in their result instead and the batch archive skips them.
+        if batch_id:
+            return {"progress": 100, "error": str(e) or type(e).__name__}
+        raise
+    finally:
+        release_work_dir(job_id)
+
+@celery.task(bind=True)
+def package_batch(self, results: list[dict], batch_id: str, names: list[str]):
+    """Chord callback: one archive over every successful batch member, in upload order."""
+    outputs, arcnames, keys, seen = [], [], [], set()
+    try:
+        for result, name in zip(results, names):
+            if not result or not result.get("output"):
+                continue
+            arcname = f"{Path(name).stem}{Path(result['output']).suffix}"
+            n = 1
+            while arcname in seen:
+                n += 1
+                arcname = f"{Path(name).stem}_{n}{Path(result['output']).suffix}"
+            seen.add(arcname)
+            outputs.append(stage_input(result["output"], batch_id))
+            arcnames.append(arcname)
+            keys.append(result["output"])
+        if not outputs:
+            raise RuntimeError("No file in the batch converted successfully")
+        with metrics.timed("package", "batch"):
+            final_path, size, sha256 = package_outputs(batch_id, outputs, zip_name="batch", arcnames=arcnames)
+        if sha256 is not None:
+            manifest.record(batch_id, "outputs", [manifest.entry(str(final_path), size, sha256, archive=True)])
         else:
-            raise ValueError(f"Unsupported target or missing input: {target}")
+            final_path = Path(keys[0])  # the member's stored output, not its staged copy
+    finally:
+        release_work_dir(batch_id)  # unpins the staged member outputs
+    return {
+        "progress": 100,
+        "download_url": presign_download(final_path),
+        "succeeded": len(outputs),
+        "failed": len(results) - len(outputs),
+    }
+
+def _deliverable_entry(local_path: Path, key: Path, archive) -> dict:
+    """Manifest entry for the job's single download (the archive was hashed while written)."""
+    if archive is not None:
+        return manifest.entry(str(key), archive.size, archive.sha256, archive=True)
+    return manifest.file_entry(local_path, key=str(key))
+
+class Publisher:
+    """on_ready callback for multi-output steps: publishes outputs in order as they are written.
+
+    Each file is made durable (uploaded for remote storage), recorded in the
+    manifest and appended to the job's output list, so clients can fetch the
+    first pages while the rest still render; with ``archive`` it is also
+    added to the job's zip.
+    """
+    def __init__(self, job_id: str, zip_name: str, archive: bool, progress: Progress):
+        self.job_id, self.zip_name, self.archive, self.progress = job_id, zip_name, archive, progress
+        self.count = 0
+        self.first_at: float | None = None
+        self.zw = None
 
-        download_url = presign_download(final_path)
-        return {"progress": 100, "download_url": download_url}
+    def __call__(self, paths: list[Path], total: int):
+        if total <= 1 or not paths:
+            return
+        if self.archive and self.zw is None:
+            self.zw = open_zip(self.job_id, self.zip_name)
+        entries, listed = [], []
+        for p in paths:
+            entry = manifest.file_entry(p, key=str(publish_output(self.job_id, p)))
+            self.count += 1
+            entries.append(entry)
+            listed.append({"index": self.count, "name": entry["name"], "key": entry["key"], "size": entry["size"]})
+            if self.zw is not None:
+                self.zw.add(p)
+        manifest.record(self.job_id, "outputs", entries)
+        jobstore.add_outputs(self.job_id, listed, self.count, total)
+        self.first_at = self.first_at or time.time()
+        events.publish(self.job_id, "processing", self.progress.last_pct, outputs_ready=self.count, outputs_total=total)
 
-    except Exception:
+    def abort(self):
+        if self.zw is not None:
+            self.zw.abort()
+            self.zw = None
+
+def _convert(job_id: str, target: str, jd: Path, src: Path | None, options: dict, multi_inputs: list[str] | None, progress: Progress, media: dict | None = None, archive: bool = True):
+    """Runs the plan; returns (single download or None, final-step outputs, publisher)."""
+    try:
+        steps = registry.plan(target)
+    except ValueError as e:
+        raise ValueError(f"Unsupported target: {target}") from e
+    inputs = [Path(p) for p in multi_inputs] if multi_inputs else ([src] if src else [])
+    if not inputs:
+        raise RuntimeError(f"No input files provided for {target}")
+
+    final = steps[-1]
+    pub = Publisher(job_id, final.zip_name, archive, progress)
+
+    n = len(steps)
+    engine_start = time.perf_counter()
+    try:
+        for i, step in enumerate(steps):
+            last = i == n - 1
+            # Intermediates stay in worker-local scratch; only the final step writes to the job dir
+            ctx = registry.StepContext(
+                out_dir=jd if last else scratch_dir(job_id, f"step{i}"),
+                options=options,
+                progress=lambda f, _i=i, **meta: progress((_i + f) / n, **meta),
+                on_ready=pub if last else None,
+                media=media if i == 0 and len(inputs) == 1 else None,
+            )
+            inputs = step.run(inputs, ctx)
+    except BaseException:
+        pub.abort()
         raise
+    finally:
+        metrics.observe("engine", time.perf_counter() - engine_start, target)
+
+    if not inputs:
+        raise RuntimeError("No output files produced")
+    if len(inputs) == 1:
+        return inputs[0], inputs, pub
+    with metrics.timed("package", target):
+        try:
+            pub(inputs[pub.count:], len(inputs))  # whatever the step did not hand over while running
+        except BaseException:
+            pub.abort()
+            raise
+        if pub.zw is None:
+            return None, inputs, pub
+        return Path(pub.zw.close()), inputs, pub
@@ -0,0 +1,95 @@
+"""Conversion benchmarks.
+
+    python -m backend.bench corpus                      # build the synthetic inputs
+    python -m backend.bench run --mode eager --out bench.json
+    python -m backend.bench run --mode redis --burst 8 --baseline baseline.json
+    python -m backend.bench compare baseline.json bench.json
+    python -m backend.bench startup --out startup.json  # API / worker-child cold start
+
+Exit status is 1 when a comparison finds a regression.
+"""
+import argparse, json, os, sys
+from pathlib import Path
+
+DEFAULT_DIR = Path(os.environ.get("BENCH_DIR", "/tmp/convertbuddy-bench"))
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m backend.bench")
+    ap.add_argument("--dir", type=Path, default=DEFAULT_DIR, help="corpus and eager-mode storage root")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("corpus", help="generate the synthetic corpus")
+    c.add_argument("--only", nargs="*")
+    c.add_argument("--force", action="store_true")
+
+    r = sub.add_parser("run", help="run targets over the corpus")
+    r.add_argument("--mode", choices=("eager", "redis"), default="eager")
+    r.add_argument("--repeat", type=int, default=3)
+    r.add_argument("--only", nargs="*", help="corpus item names")
+    r.add_argument("--targets", nargs="*", help='e.g. "pdf->jpg"')
+    r.add_argument("--options", default="{}", help="JSON options passed to every job")
+    r.add_argument("--burst", type=int, default=0, help="redis mode: also enqueue N copies at once for throughput")
+    r.add_argument("--timeout", type=int, default=1800)
+    r.add_argument("--out", type=Path)
+    r.add_argument("--baseline", type=Path, help="compare against this report when done")
+    r.add_argument("--tolerance", type=float, default=1.0, help="multiplier on the default tolerances")
+
+    st = sub.add_parser("startup", help="measure API import and worker child start-up")
+    st.add_argument("--repeat", type=int, default=5)
+    st.add_argument("--out", type=Path)
+    st.add_argument("--baseline", type=Path)
+    st.add_argument("--tolerance", type=float, default=1.0)
+
+    cmp_ = sub.add_parser("compare", help="compare two reports")
+    cmp_.add_argument("baseline", type=Path)
+    cmp_.add_argument("current", type=Path)
+    cmp_.add_argument("--tolerance", type=float, default=1.0)
+
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run" and args.mode == "eager":
+        # Must be set before the app's settings are imported
+        os.environ.setdefault("STORAGE_DIR", str(args.dir / "storage"))
+        os.environ.setdefault("STAGING_DIR", str(args.dir / "staging"))
+
+    from .compare import compare, print_rows
+    if args.cmd == "compare":
+        rows, regressions = compare(json.loads(args.baseline.read_text()), json.loads(args.current.read_text()), args.tolerance)
+        print_rows(rows)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+
+    if args.cmd == "startup":
+        from .startup import run as run_startup
+        report = run_startup(args.repeat)
+        if args.out:
+            args.out.write_text(json.dumps(report, indent=2))
+        if args.baseline:
+            _, regressions = compare(json.loads(args.baseline.read_text()), report, args.tolerance)
+            for line in regressions:
+                print(f"REGRESSION {line}")
+            return 1 if regressions else 0
+        return 0
+
+    from .corpus import build
+    items = build(args.dir / "corpus", only=args.only, force=getattr(args, "force", False))
+    if args.cmd == "corpus":
+        for item in items:
+            print(f"{item.name:20s} {len(item.paths)} file(s)")
+        return 0
+
+    from .runner import run
+    report = run(items, mode=args.mode, repeat=args.repeat, targets=args.targets,
+                 options=json.loads(args.options), burst=args.burst, timeout=args.timeout)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        _, regressions = compare(json.loads(args.baseline.read_text()), report, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
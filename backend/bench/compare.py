@@ -0,0 +1,44 @@
+"""Flags regressions between two benchmark reports."""
+
+# metric -> (relative tolerance, absolute floor); a change must exceed both to count
+TOLERANCES = {
+    "wall_s": (0.10, 0.05),
+    "queue_wait_s": (0.25, 0.10),
+    "cpu_s": (0.10, 0.05),
+    "child_peak_rss_kb": (0.15, 4096),
+    "output_bytes": (0.05, 1024),
+    "first_output_s": (0.15, 0.05),   # multi-output jobs: time until the first file is downloadable
+    # startup reports (python -m backend.bench startup)
+    "import_s": (0.15, 0.05),
+    "child_init_s": (0.15, 0.02),
+    "modules": (0.05, 20),
+}
+# Higher is better
+THROUGHPUT = {"jobs_per_s": (0.10, 0.05)}
+
+def compare(baseline: dict, current: dict, scale: float = 1.0) -> tuple[list[dict], list[str]]:
+    """Returns (rows, regressions); ``scale`` multiplies every relative tolerance."""
+    rows, regressions = [], []
+    for name, case in current["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        if base.get("summary") and not case.get("summary"):
+            regressions.append(f"{name}: now fails ({case.get('error')})")
+            continue
+        for metric, (rel, floor) in {**TOLERANCES, **THROUGHPUT}.items():
+            old, new = base["summary"].get(metric), case["summary"].get(metric)
+            if old is None or new is None:
+                continue
+            delta = new - old if metric in TOLERANCES else old - new
+            pct = (new - old) / old * 100 if old else 0.0
+            worse = delta > floor and delta > abs(old) * rel * scale
+            rows.append({"case": name, "metric": metric, "baseline": old, "current": new, "change_pct": round(pct, 1), "regression": worse})
+            if worse:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({pct:+.1f}%)")
+    return rows, regressions
+
+def print_rows(rows: list[dict]):
+    for r in rows:
+        flag = "REGRESSION" if r["regression"] else ""
+        print(f"{r['case']:40s} {r['metric']:18s} {r['baseline']:>12} -> {r['current']:>12} {r['change_pct']:+7.1f}% {flag}")
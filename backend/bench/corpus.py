@@ -0,0 +1,145 @@
+"""Synthetic, reproducible benchmark inputs.
+
+Everything is generated locally with the same engines the workers use
+(ImageMagick, ffmpeg) plus plain zipfile for .docx, with fixed seeds so two
+machines build byte-comparable corpora. Items whose generator tool is missing
+are skipped with a note rather than failing the whole run.
+"""
+import json, subprocess, zipfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+@dataclass
+class Item:
+    name: str
+    fmt: str                                  # registry format name of the input(s)
+    paths: list[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+
+# name -> (format, params). Bump CORPUS_VERSION when generators change.
+CORPUS_VERSION = 1
+SPEC: dict[str, tuple[str, dict]] = {
+    "img-small-jpg": ("jpg", {"size": "640x480", "ext": "jpg"}),
+    "img-a4-jpg": ("jpg", {"size": "2480x3508", "ext": "jpg"}),
+    "img-24mp-jpg": ("jpg", {"size": "6000x4000", "ext": "jpg"}),
+    "img-a4-png": ("png", {"size": "2480x3508", "ext": "png"}),
+    "img-a4-webp": ("webp", {"size": "2480x3508", "ext": "webp"}),
+    "img-a4-tiff": ("tiff", {"size": "2480x3508", "ext": "tiff"}),
+    "img-album-20-jpg": ("jpg", {"size": "2480x3508", "ext": "jpg", "count": 20}),
+    "pdf-1p": ("pdf", {"pages": 1}),
+    "pdf-10p": ("pdf", {"pages": 10}),
+    "pdf-50p": ("pdf", {"pages": 50}),
+    "mp4-10s": ("mp4", {"seconds": 10, "size": "1280x720"}),
+    "mp4-60s": ("mp4", {"seconds": 60, "size": "1280x720"}),
+    "docx-short": ("docx", {"paragraphs": 50}),
+    "docx-long": ("docx", {"paragraphs": 1500}),
+}
+
+_LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+)
+
+def _image(dst: Path, size: str, seed: int):
+    subprocess.run(
+        ["magick", "-seed", str(seed), "-size", size, "plasma:fractal", "-quality", "90", str(dst)],
+        check=True, capture_output=True,
+    )
+
+def _pdf(dst: Path, pages: int, work: Path):
+    # One raster page per sheet: what scanned PDFs (the common pdf->jpg input) look like
+    from backend.app.services.pdfwriter import images_to_pdf_native
+    page = work / "_page.jpg"
+    if not page.exists():
+        _image(page, "1240x1754", 7)
+    images_to_pdf_native([page] * pages, dst, dpi=150, threads=1)
+
+def _mp4(dst: Path, seconds: int, size: str):
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(seconds), "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-shortest", str(dst),
+    ], check=True, capture_output=True)
+
+def _docx(dst: Path, paragraphs: int):
+    body = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(f"{i + 1}. {_LOREM}")}</w:t></w:r></w:p>'
+        for i in range(paragraphs)
+    )
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ),
+    }
+    with zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in parts.items():
+            # Fixed timestamps keep the archive byte-identical between builds
+            zf.writestr(zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0)), xml)
+
+def _generate(name: str, fmt: str, params: dict, root: Path) -> list[Path]:
+    if fmt in ("jpg", "png", "webp", "tiff"):
+        count = params.get("count", 1)
+        paths = [root / f"{name}-{i:03d}.{params['ext']}" for i in range(count)]
+        for i, p in enumerate(paths):
+            _image(p, params["size"], seed=i + 1)
+        return paths
+    dst = root / f"{name}.{fmt}"
+    if fmt == "pdf":
+        _pdf(dst, params["pages"], root)
+    elif fmt == "mp4":
+        _mp4(dst, params["seconds"], params["size"])
+    elif fmt == "docx":
+        _docx(dst, params["paragraphs"])
+    else:
+        raise ValueError(f"No generator for {fmt}")
+    return [dst]
+
+def build(root: Path, only: list[str] | None = None, force: bool = False) -> list[Item]:
+    """Generate (or reuse) the corpus under ``root``; returns the items that exist."""
+    root.mkdir(parents=True, exist_ok=True)
+    manifest_path = root / "manifest.json"
+    manifest = {}
+    if manifest_path.exists() and not force:
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != CORPUS_VERSION:
+            manifest = {}
+    entries = manifest.get("items", {})
+    items = []
+    for name, (fmt, params) in SPEC.items():
+        if only and name not in only:
+            continue
+        cached = entries.get(name)
+        if cached and cached["params"] == params and all(Path(p).exists() for p in cached["paths"]):
+            items.append(Item(**cached))
+            continue
+        try:
+            paths = _generate(name, fmt, params, root)
+        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            print(f"corpus: skipping {name}: {e}")
+            continue
+        item = Item(name, fmt, [str(p) for p in paths], params)
+        entries[name] = asdict(item)
+        items.append(item)
+    manifest_path.write_text(json.dumps({"version": CORPUS_VERSION, "items": entries}, indent=2))
+    return items
@@ -0,0 +1,157 @@
+"""Runs every supported target over the corpus through convert_task.
+
+"eager" executes the task in this process (no broker; queue wait is zero and
+the numbers isolate engine + storage cost). "redis" enqueues through the
+configured broker exactly like the API does, so routing, prefetch and worker
+concurrency are part of the measurement; it needs running workers that share
+this process's storage settings.
+"""
+import os, platform, statistics, subprocess, time, uuid
+from pathlib import Path
+from types import SimpleNamespace
+from .corpus import CORPUS_VERSION, Item
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def cases(items: list[Item], targets: list[str] | None = None) -> list[tuple[Item, str]]:
+    from backend.app.services import registry
+    out = []
+    for item in items:
+        for target in sorted(registry.supported_targets()):
+            if target.partition("->")[0] != item.fmt or (targets and target not in targets):
+                continue
+            # Several inputs only make sense for targets that merge them
+            if len(item.paths) > 1 and not registry.accepts_many(target):
+                continue
+            out.append((item, target))
+    return out
+
+def _stage(job_id: str, item: Item) -> dict:
+    """Copy the item into job storage; returns convert_task kwargs for it."""
+    from backend.app.services.storage import save_upload
+    keys = []
+    for i, p in enumerate(item.paths):
+        with open(p, "rb") as f:
+            name = f"{i:03d}_{Path(p).name}" if len(item.paths) > 1 else Path(p).name
+            keys.append(str(save_upload(job_id, SimpleNamespace(filename=name, file=f))))
+    kwargs = {
+        "input_size": sum(os.path.getsize(p) for p in item.paths),
+        "page_count": item.params.get("pages"),
+    }
+    if len(keys) > 1:
+        kwargs["multi_inputs"] = keys
+    else:
+        kwargs["input_path"] = keys[0]
+    return kwargs
+
+def _sample(mode: str, target: str, item: Item, options: dict, timeout: int) -> dict:
+    from backend.app.workers.tasks import convert_task
+    job_id = str(uuid.uuid4())
+    kwargs = {"job_id": job_id, "target": target, "options": options, **_stage(job_id, item)}
+    submitted = time.time()
+    if mode == "eager":
+        res = convert_task.apply(kwargs=kwargs, task_id=job_id)
+    else:
+        res = convert_task.apply_async(kwargs=kwargs, task_id=job_id)
+        res.get(timeout=timeout, propagate=False)
+    wall = time.time() - submitted
+    result = res.result
+    if not isinstance(result, dict) or result.get("error") or "stats" not in result:
+        return {"job_id": job_id, "error": str(result.get("error") if isinstance(result, dict) else result)}
+    stats = result["stats"]
+    return {
+        "job_id": job_id,
+        "wall_s": round(wall, 3),
+        "queue_wait_s": round(max(stats["started_at"] - submitted, 0.0), 3) if mode != "eager" else 0.0,
+        "cpu_s": round(stats["cpu_s"] + stats["child_cpu_s"], 3),
+        "child_peak_rss_kb": stats["child_peak_rss_kb"],
+        "output_bytes": stats["output_bytes"],
+        "first_output_s": stats.get("first_output_s"),
+        "engine_runs": stats["engine_runs"],
+    }
+
+def _summary(samples: list[dict]) -> dict:
+    ok = [s for s in samples if "error" not in s]
+    if not ok:
+        return {}
+    med = lambda k: round(statistics.median(s[k] for s in ok if s[k] is not None), 3) if any(s[k] is not None for s in ok) else None
+    return {
+        "wall_s": med("wall_s"),
+        "wall_s_min": min(s["wall_s"] for s in ok),
+        "queue_wait_s": med("queue_wait_s"),
+        "cpu_s": med("cpu_s"),
+        "child_peak_rss_kb": max(s["child_peak_rss_kb"] for s in ok),
+        "output_bytes": med("output_bytes"),
+        "first_output_s": med("first_output_s"),
+    }
+
+def _burst(target: str, item: Item, options: dict, n: int, timeout: int) -> float:
+    """Jobs per second with ``n`` copies enqueued at once (redis mode)."""
+    from backend.app.workers.tasks import convert_task
+    submitted = time.time()
+    results = []
+    for _ in range(n):
+        job_id = str(uuid.uuid4())
+        kwargs = {"job_id": job_id, "target": target, "options": options, **_stage(job_id, item)}
+        results.append((job_id, convert_task.apply_async(kwargs=kwargs, task_id=job_id)))
+    for _, r in results:
+        r.get(timeout=timeout, propagate=False)
+    _discard([j for j, _ in results])
+    return round(n / (time.time() - submitted), 3)
+
+def _discard(job_ids: list[str]):
+    from backend.app.services.storage import get_backend
+    get_backend().delete_jobs(job_ids)
+
+def run(
+    items: list[Item],
+    mode: str = "eager",
+    repeat: int = 3,
+    targets: list[str] | None = None,
+    options: dict | None = None,
+    burst: int = 0,
+    timeout: int = 1800,
+) -> dict:
+    from backend.app.config import settings
+    from backend.app.workers.celery_app import celery
+    if mode == "eager":
+        # No broker or result store needed; progress updates land in memory and the
+        # worker-side job record and event writes are best effort without Redis
+        celery.conf.update(task_always_eager=True, result_backend="cache+memory://")
+    options = options or {}
+    report = {
+        "meta": {
+            "mode": mode,
+            "repeat": repeat,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_rev": _git_rev(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "storage_backend": settings.storage_backend,
+            "corpus_version": CORPUS_VERSION,
+            "options": options,
+        },
+        "cases": {},
+    }
+    for item, target in cases(items, targets):
+        name = f"{item.name}:{target}"
+        samples = []
+        for _ in range(repeat):
+            samples.append(_sample(mode, target, item, options, timeout))
+        _discard([s["job_id"] for s in samples])
+        case = {"item": item.name, "target": target, "samples": samples, "summary": _summary(samples)}
+        if burst and mode == "redis":
+            case["summary"]["jobs_per_s"] = _burst(target, item, options, burst, timeout)
+        errors = [s["error"] for s in samples if "error" in s]
+        if errors:
+            case["error"] = errors[0]
+        report["cases"][name] = case
+        s = case["summary"]
+        print(f"{name:40s} " + (f"wall {s['wall_s']:.3f}s  cpu {s['cpu_s']:.3f}s  rss {s['child_peak_rss_kb'] / 1024:.0f} MiB"
+                                if s else f"FAILED: {case.get('error')}"))
+    return report
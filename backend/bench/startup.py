@@ -0,0 +1,85 @@
+"""Cold-start cost of the API and of a Celery prefork child.
+
+Each sample is a fresh interpreter, so nothing is warm but the OS page cache:
+
+* ``api``: importing ``backend.app.main`` (what uvicorn does before serving).
+* ``worker``: importing the Celery app with its task modules (the worker's
+  main process), then forking a child and running ``worker_process_init``
+  handlers, which is the delay before a new or recycled child takes a task.
+
+Besides time, each case records how many modules were loaded and which of the
+heavy optional ones (boto3, magic, PIL, prometheus_client) got pulled in.
+"""
+import json, os, platform, statistics, subprocess, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+HEAVY = ("boto3", "botocore", "magic", "PIL", "prometheus_client", "backend.app.workers.tasks")
+
+_API = """
+import json, sys, time
+t = time.perf_counter()
+import backend.app.main
+print(json.dumps({"import_s": time.perf_counter() - t, "modules": len(sys.modules),
+                  "heavy": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+_WORKER = """
+import json, os, sys, time
+t = time.perf_counter()
+from backend.app.workers.celery_app import celery
+celery.loader.import_default_modules()
+imported = time.perf_counter() - t
+r, w = os.pipe()
+pid = os.fork()
+if pid == 0:
+    from celery.signals import worker_process_init
+    t = time.perf_counter()
+    worker_process_init.send(sender=None)
+    os.write(w, repr(time.perf_counter() - t).encode())
+    os._exit(0)
+os.close(w)
+child = float(os.read(r, 64) or "nan")
+os.waitpid(pid, 0)
+print(json.dumps({"import_s": imported, "child_init_s": child, "modules": len(sys.modules),
+                  "heavy": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+def _sample(script: str) -> dict:
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", f"HEAVY = {HEAVY!r}\n{script}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    sample = json.loads(out.strip().splitlines()[-1])
+    sample["wall_s"] = time.perf_counter() - start
+    return sample
+
+def run(repeat: int = 5) -> dict:
+    report = {
+        "meta": {
+            "kind": "startup",
+            "repeat": repeat,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "cases": {},
+    }
+    for name, script in (("api", _API), ("worker", _WORKER)):
+        try:
+            samples = [_sample(script) for _ in range(repeat)]
+        except subprocess.CalledProcessError as e:
+            error = ((e.stderr or "").strip().splitlines() or ["exit status %d" % e.returncode])[-1]
+            report["cases"][f"startup:{name}"] = {"summary": {}, "error": error}
+            print(f"startup:{name:32s} FAILED: {error}")
+            continue
+        summary = {
+            k: round(statistics.median(s[k] for s in samples), 4)
+            for k in ("wall_s", "import_s", "child_init_s", "modules") if k in samples[0]
+        }
+        summary["heavy"] = samples[0]["heavy"]
+        report["cases"][f"startup:{name}"] = {"samples": samples, "summary": summary}
+        print(f"startup:{name:32s} " + "  ".join(f"{k} {v}" for k, v in summary.items()))
+    return report
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Run from the repo root or from backend/: tests import the app as ``app``
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,79 @@
+import os
+import pytest
+
+pytest.importorskip("pydantic_settings")
+from fastapi import HTTPException
+from app.routers import files
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),          # suffix longer than the file
+    ("bytes=990-5000", (990, 999)),     # end clamped to the last byte
+    ("bytes=999-999", (999, 999)),
+    ("BYTES = 0-0", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert files._parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-1,5-9",    # multi-range: full body
+    "items=0-9",
+    "bytes=abc-",
+    "bytes=-0",
+    "bytes=-",
+])
+def test_parse_range_ignored(header):
+    assert files._parse_range(header, 1000) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-2000", "bytes=50-10"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as exc:
+        files._parse_range(header, 1000)
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */1000"
+
+def test_parse_range_empty_file():
+    with pytest.raises(HTTPException) as exc:
+        files._parse_range("bytes=0-", 0)
+    assert exc.value.status_code == 416
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    pytest.importorskip("httpx")
+    pytest.importorskip("aiofiles")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    monkeypatch.setattr(files, "BASE", tmp_path.resolve())
+    monkeypatch.setattr(files.settings, "download_offload", "none")
+    (tmp_path / "blob.bin").write_bytes(bytes(range(256)) * 4)
+    app = FastAPI()
+    app.include_router(files.router)
+    return TestClient(app)
+
+def test_range_request(client):
+    r = client.get("/files/blob.bin", headers={"Range": "bytes=-4"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == "bytes 1020-1023/1024"
+    assert r.content == bytes([252, 253, 254, 255])
+
+def test_range_not_satisfiable(client):
+    r = client.get("/files/blob.bin", headers={"Range": "bytes=2048-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == "bytes */1024"
+
+def test_if_range_match(client):
+    etag = client.head("/files/blob.bin").headers["etag"]
+    r = client.get("/files/blob.bin", headers={"Range": "bytes=0-1", "If-Range": etag})
+    assert r.status_code == 206
+    assert r.content == b"\x00\x01"
+
+def test_if_range_mismatch_sends_full_body(client, tmp_path):
+    etag = client.head("/files/blob.bin").headers["etag"]
+    st = os.stat(tmp_path / "blob.bin")
+    os.utime(tmp_path / "blob.bin", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    r = client.get("/files/blob.bin", headers={"Range": "bytes=0-1", "If-Range": etag})
+    assert r.status_code == 200
+    assert len(r.content) == 1024
+    assert "content-range" not in r.headers
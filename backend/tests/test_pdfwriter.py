@@ -0,0 +1,89 @@
+import re
+import pytest
+from app.services.pdfwriter import UnsupportedImage, _jpeg_info, images_to_pdf_native
+
+def _jpeg(width, height, comps=3, precision=8, adobe=False) -> bytes:
+    """Header-only JPEG: enough for the passthrough path, which never decodes."""
+    out = b"\xff\xd8" + b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    if adobe:
+        out += b"\xff\xee\x00\x0eAdobe\x00\x64\x00\x00\x00\x00\x02"
+    sof = bytes([precision]) + height.to_bytes(2, "big") + width.to_bytes(2, "big") + bytes([comps])
+    sof += b"".join(bytes([i + 1, 0x11, 0]) for i in range(comps))
+    out += b"\xff\xc0" + (len(sof) + 2).to_bytes(2, "big") + sof
+    return out + b"\xff\xda\x00\x08\x01\x01\x00\x00\x3f\x00" + b"\x00" * 16 + b"\xff\xd9"
+
+def _check_pdf(path, pages):
+    """Structural check: header, trailer, and every xref offset lands on its object."""
+    data = path.read_bytes()
+    assert data.startswith(b"%PDF-1.4\n")
+    assert data.rstrip().endswith(b"%%EOF")
+    xref = int(re.search(rb"startxref\n(\d+)\n%%EOF", data).group(1))
+    assert data[xref:xref + 5] == b"xref\n"
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[xref:]).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n \n", data[xref:])
+    assert len(entries) == count - 1
+    for num, off in enumerate(entries, start=1):
+        assert data[int(off):].startswith(f"{num} 0 obj\n".encode())
+    assert f"/Count {pages}".encode() in data
+    return data
+
+def test_jpeg_info():
+    assert _jpeg_info(_jpeg(640, 480)) == (640, 480, 3, False)
+    assert _jpeg_info(_jpeg(10, 20, comps=4, adobe=True)) == (10, 20, 4, True)
+
+@pytest.mark.parametrize("data", [
+    b"\x89PNG\r\n\x1a\n",
+    _jpeg(8, 8, precision=12),
+    b"\xff\xd8\xff\xd9",
+])
+def test_jpeg_info_rejects(data):
+    with pytest.raises(UnsupportedImage):
+        _jpeg_info(data)
+
+def test_jpeg_passthrough(tmp_path):
+    srcs = []
+    for i, (w, h) in enumerate([(300, 600), (600, 300)]):
+        p = tmp_path / f"{i}.jpg"
+        p.write_bytes(_jpeg(w, h))
+        srcs.append(p)
+    dst = tmp_path / "out.pdf"
+    seen = []
+    images_to_pdf_native(srcs, dst, dpi=300, threads=2, on_progress=seen.append)
+    data = _check_pdf(dst, pages=2)
+    assert seen == [0.5, 1.0]
+    # Embedded byte-for-byte at the requested dpi
+    assert srcs[0].read_bytes() in data
+    assert b"/Filter /DCTDecode" in data
+    assert b"/MediaBox [0 0 72.0000 144.0000]" in data
+
+def test_cmyk_adobe_jpeg_is_inverted(tmp_path):
+    src = tmp_path / "cmyk.jpg"
+    src.write_bytes(_jpeg(4, 4, comps=4, adobe=True))
+    dst = tmp_path / "out.pdf"
+    images_to_pdf_native([src], dst)
+    data = _check_pdf(dst, pages=1)
+    assert b"/ColorSpace /DeviceCMYK" in data
+    assert b"/Decode [1 0 1 0 1 0 1 0]" in data
+
+def test_unsupported_input_removes_output(tmp_path):
+    good, bad = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    good.write_bytes(_jpeg(4, 4))
+    bad.write_bytes(_jpeg(4, 4, precision=12))
+    dst = tmp_path / "out.pdf"
+    with pytest.raises(UnsupportedImage):
+        images_to_pdf_native([good, bad], dst)
+    assert not dst.exists()
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "P"])
+def test_png_to_pdf(tmp_path, mode):
+    Image = pytest.importorskip("PIL.Image")
+    src = tmp_path / "in.png"
+    Image.new(mode, (30, 20)).save(src)
+    dst = tmp_path / "out.pdf"
+    images_to_pdf_native([src], dst, dpi=72)
+    data = _check_pdf(dst, pages=1)
+    assert b"/Filter /FlateDecode" in data
+    assert b"/MediaBox [0 0 30.0000 20.0000]" in data
+    pypdf = pytest.importorskip("pypdf")
+    reader = pypdf.PdfReader(str(dst))
+    assert len(reader.pages) == 1
@@ -0,0 +1,45 @@
+import hashlib, zipfile
+import pytest
+from app.services.zipstream import ZipStreamWriter, compress_type_for
+
+def test_compress_type_for():
+    assert compress_type_for("a.JPG") == zipfile.ZIP_STORED
+    assert compress_type_for("a.mp4") == zipfile.ZIP_STORED
+    assert compress_type_for("a.txt") == zipfile.ZIP_DEFLATED
+    assert compress_type_for("noext") == zipfile.ZIP_DEFLATED
+
+def test_round_trip(tmp_path):
+    members = {
+        "notes.txt": b"hello zip\n" * 1000,
+        "photo.jpg": bytes(range(256)) * 64,
+        "empty.csv": b"",
+    }
+    for name, data in members.items():
+        (tmp_path / name).write_bytes(data)
+    dst = tmp_path / "out.zip"
+    with open(dst, "wb") as sink:
+        w = ZipStreamWriter(sink, str(dst))
+        for name in members:
+            w.add(tmp_path / name, f"job/{name}")
+        assert w.close() == str(dst)
+    assert w.count == 3
+
+    raw = dst.read_bytes()
+    assert w.size == len(raw)
+    assert w.sha256 == hashlib.sha256(raw).hexdigest()
+    with zipfile.ZipFile(dst) as z:
+        assert z.testzip() is None
+        assert sorted(z.namelist()) == sorted(f"job/{n}" for n in members)
+        for name, data in members.items():
+            assert z.read(f"job/{name}") == data
+        assert z.getinfo("job/photo.jpg").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("job/notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+def test_abort_removes_partial(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"x")
+    dst = tmp_path / "out.zip"
+    with pytest.raises(RuntimeError):
+        with ZipStreamWriter(open(dst, "wb"), str(dst)) as w:
+            w.add(tmp_path / "a.txt")
+            raise RuntimeError
+    assert not dst.exists()
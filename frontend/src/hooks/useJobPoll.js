@@ -1,26 +1,47 @@
-
 export function useJobPoll(apiBase, jobId, onUpdate) {
   let interval = null;
+  let source = null;
   async function tick() {
     try {
       const res = await fetch(`${apiBase}/jobs/${jobId}`);
       const json = await res.json();
       onUpdate(json);
-      if (json.status === 'done' || json.status === 'error') {
+      if (json.status === 'done' || json.status === 'error' || json.status === 'cancelled') {
         clear();
       }
     } catch (e) {
       console.error(e);
     }
   }
-  function start() {
+  function poll() {
     if (interval) clearInterval(interval);
     interval = setInterval(tick, 1500);
     tick();
   }
+  function start() {
+    clear();
+    if (typeof EventSource === 'undefined') return poll();
+    // Server pushes every progress/state change; fall back to polling if the stream fails
+    source = new EventSource(`${apiBase}/jobs/${jobId}/events`);
+    source.addEventListener('status', (e) => {
+      const json = JSON.parse(e.data);
+      onUpdate(json);
+      if (json.status === 'done' || json.status === 'error' || json.status === 'cancelled') {
+        clear();
+      }
+    });
+    source.onerror = () => {
+      if (!source) return;
+      source.close();
+      source = null;
+      poll();
+    };
+  }
   function clear() {
     if (interval) clearInterval(interval);
     interval = null;
+    if (source) source.close();
+    source = null;
   }
   return { start, clear };
 }